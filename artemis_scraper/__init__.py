@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+Created by Federico Di Tirro; 
+@author: wb593691
+Last Version: 06/01/2024
+
+"""
+
+# Importing the package has no side effects: nothing is read from config.ini, no
+# directory is changed and no browser is started until the command line entry point
+# (python -m artemis_scraper) runs. Selenium and openpyxl are only imported by the
+# modules that need them (fetcher, export), and HTML parsers when a page is read.
+
+from .extraction import (
+    parse_attachment_point,
+    parse_attachment_probability,
+    parse_expected_loss,
+    parse_maturity,
+    parse_spread,
+    parse_tranche_details,
+    check_multiple_tranche,
+    size_tranches,
+    read_deal_page,
+    extract_deal_facts,
+    deal_from_facts,
+)
+from .records import Deal, Tranche, TrancheSequence
+from .phrases import PHRASES, PhraseClassifier
+from .batch import extract_batch
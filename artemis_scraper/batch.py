@@ -0,0 +1,154 @@
+# Batch extraction: the parse_* functions over many descriptions at once, returned as
+# typed columns instead of one mixed-type value per call. Numeric columns are floats
+# with NaN where nothing was extracted, each with a status column telling why.
+
+from array import array
+from collections import OrderedDict
+from contextlib import redirect_stdout
+
+import io
+import os
+import sys
+import datetime
+
+from .extraction import (
+    attachment_point_amount,
+    parse_attachment_probability,
+    parse_expected_loss,
+    parse_maturity,
+    parse_spread,
+    check_multiple_tranche,
+)
+from .reparse import map_in_processes
+
+NAN = float("nan")
+
+# Status of an extracted value: "invalid" is text the parser could not turn into a
+# number (e.g. "Invalid issue date"), "error" a parser that raised
+FOUND = "found"
+MISSING = "missing"
+INVALID = "invalid"
+ERROR = "error"
+STATUSES = (FOUND, MISSING, INVALID, ERROR)
+
+# Numeric columns, the parser of each one and the values it returns when it finds
+# nothing
+DESCRIPTION_PARSERS = [
+    ("maturity", parse_maturity, ("Unknown",)),
+    ("attachment_probability", parse_attachment_probability, ("None",)),
+    ("attachment_point", attachment_point_amount, (None,)),
+    ("expected_loss", parse_expected_loss, ("NA",)),
+    ("spread", parse_spread, ("NA",)),
+]
+NUMERIC_COLUMNS = [column for column, _, _ in DESCRIPTION_PARSERS] + ["risk_multiple"]
+
+
+def issue_date_text(date_of_issue):
+    # "Month YYYY" as parse_maturity expects it, from a string, a date or a timestamp
+    if isinstance(date_of_issue, str):
+        return date_of_issue
+    if isinstance(date_of_issue, datetime.date):
+        try:
+            return date_of_issue.strftime("%B %Y")
+        except ValueError:  # pandas.NaT
+            return "NA"
+    return "NA"
+
+
+def extract_description(item):
+    # Worker: (value, status) of every numeric column of one description, the currency
+    # of the attachment point and whether the deal has multiple tranches
+    description, date_of_issue = item
+    description = description if isinstance(description, str) else ""
+    date_of_issue = issue_date_text(date_of_issue)
+    values = OrderedDict()
+    currency = ""
+    for column, parser, missing_values in DESCRIPTION_PARSERS:
+        try:
+            if parser is parse_maturity and date_of_issue == "NA":
+                # Without a date of issue only explicit start and end dates give a
+                # maturity; the message about the missing date is not printed for
+                # every description
+                with redirect_stdout(io.StringIO()):
+                    value = parser(description, date_of_issue)
+                if value == "Invalid issue date":
+                    value = "Unknown"
+            elif parser is parse_maturity:
+                value = parser(description, date_of_issue)
+            else:
+                value = parser(description)
+        except Exception:
+            values[column] = (NAN, ERROR)
+            continue
+        if parser is attachment_point_amount and value is not None:
+            value, currency = value
+        if isinstance(value, (int, float)):
+            values[column] = (float(value), FOUND)
+        elif value in missing_values:
+            values[column] = (NAN, MISSING)
+        else:
+            values[column] = (NAN, INVALID)
+
+    # Risk Multiple only if spread and expected loss are known, as in the sheet
+    spread, spread_status = values["spread"]
+    expected_loss, expected_loss_status = values["expected_loss"]
+    if ERROR in (spread_status, expected_loss_status):
+        values["risk_multiple"] = (NAN, ERROR)
+    elif spread_status == FOUND and expected_loss_status == FOUND and expected_loss > 0:
+        values["risk_multiple"] = (round(spread / expected_loss, 2), FOUND)
+    else:
+        values["risk_multiple"] = (NAN, MISSING)
+    return values, currency, check_multiple_tranche(description) == "Yes"
+
+
+def extract_batch(descriptions, dates_of_issue=None, workers=None, as_frame=None):
+    # Extract every description of `descriptions` (a sequence or a pandas Series, with
+    # the matching dates of issue for the maturity). Descriptions are handed to
+    # `workers` processes (one per CPU by default) in chunks and the results come back
+    # in input order.
+    # Returns a pandas DataFrame for a Series input (or with as_frame=True), otherwise
+    # an OrderedDict of columns: array("d") for the numeric columns, lists for the
+    # rest.
+    if dates_of_issue is None:
+        dates_of_issue = [None] * len(descriptions)
+    if len(dates_of_issue) != len(descriptions):
+        raise ValueError("descriptions and dates_of_issue differ in length")
+    pandas = sys.modules.get("pandas")  # Only a caller that uses pandas loaded it
+    is_series = pandas is not None and isinstance(descriptions, pandas.Series)
+    if as_frame is None:
+        as_frame = is_series
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    columns = OrderedDict()
+    for column in NUMERIC_COLUMNS:
+        columns[column] = array("d")
+        columns[f"{column}_status"] = []
+    columns["attachment_point_currency"] = []
+    columns["multiple_tranche"] = []
+    items = zip(list(descriptions), list(dates_of_issue))
+    for values, currency, multiple_tranche in map_in_processes(
+        extract_description, items, workers
+    ):
+        for column, (value, status) in values.items():
+            columns[column].append(value)
+            columns[f"{column}_status"].append(status)
+        columns["attachment_point_currency"].append(currency)
+        columns["multiple_tranche"].append(multiple_tranche)
+
+    if as_frame:
+        return to_frame(columns, descriptions.index if is_series else None)
+    return columns
+
+
+def to_frame(columns, index=None):
+    # The batch columns as a DataFrame: float64 numeric columns, categorical statuses
+    import pandas
+
+    data = OrderedDict()
+    for column, values in columns.items():
+        if column.endswith("_status"):
+            data[column] = pandas.Categorical(values, categories=STATUSES)
+        else:
+            data[column] = values
+    return pandas.DataFrame(data, index=index)
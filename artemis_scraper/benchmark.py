@@ -0,0 +1,256 @@
+# Benchmark suite: times each stage of a run over a fixed corpus, fully offline. The
+# corpus is the rows of a workbook (by default the example workbook shipped in
+# examples/, which includes long multi-tranche articles) and a directory or tarball of
+# saved directory and deal pages (by default the synthetic pages built from the same
+# workbook, examples/benchmark_pages.tar.gz). Results are appended to a JSON file and
+# every stage is compared with the previous run.
+
+from openpyxl import Workbook
+from collections import OrderedDict
+
+import os
+import json
+import time
+import datetime
+import contextlib
+import subprocess
+
+from .columns import headers, SHEET_NAME
+from .extraction import (
+    parse_attachment_point,
+    parse_attachment_probability,
+    parse_expected_loss,
+    parse_maturity,
+    parse_spread,
+    check_multiple_tranche,
+    parse_tranche_details,
+    find_tranche_sequence,
+    read_deal_page,
+    extract_deal_facts,
+)
+from .export import format_sheet, export_streaming, write_new_rows
+from .fetcher import DIRECTORY_MARKERS
+from .reparse import saved_pages
+from .scrape import read_directory
+from .store import DealStore, read_sheet_rows
+
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE_CORPUS = os.path.join(REPOSITORY, "examples", "Transactions_Chart.xlsx")
+EXAMPLE_PAGES = os.path.join(REPOSITORY, "examples", "benchmark_pages.tar.gz")
+
+
+def call_quietly(function, *args):
+    # Some descriptions make the parsers raise; those calls still count in the timing
+    try:
+        return function(*args)
+    except Exception:
+        return None
+
+
+def time_stage(function, rounds):
+    # Timing statistics (in seconds) of `rounds` runs after one warm-up run
+    function()
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    mean = sum(samples) / len(samples)
+    return {
+        "min": samples[0],
+        "median": samples[len(samples) // 2],
+        "mean": mean,
+        "stddev": (sum((x - mean) ** 2 for x in samples) / len(samples)) ** 0.5,
+        "rounds": rounds,
+    }
+
+
+def load_benchmark_corpus(path, pages_source, sheet_name=SHEET_NAME):
+    rows = [row_data for row_data in read_sheet_rows(path, sheet_name) if row_data[0]]
+    deals = OrderedDict()
+    for row_data in rows:
+        deals.setdefault(row_data[headers.index("Link")], []).append(row_data)
+    corpus = []
+    for deal_rows in deals.values():
+        first = deal_rows[0]
+        date_of_issue = first[headers.index("Date of issue")]
+        if isinstance(date_of_issue, datetime.datetime):
+            date_of_issue = date_of_issue.strftime("%B %Y")
+        sizes = [row_data[headers.index("Size")] for row_data in deal_rows]
+        total_size = None
+        if all(isinstance(size, (int, float)) for size in sizes):
+            total_size = sum(sizes) / 1e6
+        corpus.append(
+            {
+                "description": str(first[headers.index("Description")] or ""),
+                "date_of_issue": date_of_issue or "NA",
+                "multiple_tranche": first[headers.index("Multiple Tranche")] == "Yes",
+                "tranches": len(deal_rows),
+                "total_size_million": total_size,
+            }
+        )
+    # Saved directory pages are timed apart from the deal pages
+    pages = []
+    directory_pages = []
+    if pages_source:
+        for _, _, page_source in saved_pages(pages_source):
+            if all(marker.search(page_source) for marker in DIRECTORY_MARKERS):
+                directory_pages.append(page_source)
+            else:
+                pages.append(page_source)
+    return rows, corpus, pages, directory_pages
+
+
+def benchmark_stages(rows, corpus, pages, directory_pages, results_path):
+    # Stage name -> function running the stage over the whole corpus
+    descriptions = [deal["description"] for deal in corpus]
+    multi = [deal for deal in corpus if deal["multiple_tranche"]]
+    sized = [deal for deal in multi if deal["total_size_million"]]
+    read_pages = [read_deal_page(page_source) for page_source in pages]
+    formatted = Workbook()
+    formatted.active.append(headers)
+    write_new_rows(formatted.active, rows, 1)
+    export_path = os.path.join(
+        os.path.dirname(os.path.abspath(results_path)), "benchmark_export.xlsx"
+    )
+
+    def run_all(function, items):
+        return lambda: [call_quietly(function, *item) for item in items]
+
+    def write_rows():
+        wb = Workbook()
+        wb.active.append(headers)
+        write_new_rows(wb.active, rows, 1)
+
+    def store_rows():
+        deal_store = DealStore(":memory:")
+        deal_store.insert_after(0, rows)
+        deal_store.close()
+
+    stages = OrderedDict()
+    if directory_pages:
+        stages["directory_parse"] = run_all(
+            read_directory, [(page,) for page in directory_pages]
+        )
+    if pages:
+        stages["html_parse"] = run_all(read_deal_page, [(page,) for page in pages])
+        stages["key_facts"] = run_all(
+            extract_deal_facts, [(fact_texts,) for _, fact_texts, _ in read_pages]
+        )
+    one = [(description,) for description in descriptions]
+    with_dates = [(deal["description"], deal["date_of_issue"]) for deal in corpus]
+    stages["parse_maturity"] = run_all(parse_maturity, with_dates)
+    stages["parse_attachment_probability"] = run_all(parse_attachment_probability, one)
+    stages["parse_expected_loss"] = run_all(parse_expected_loss, one)
+    stages["parse_attachment_point"] = run_all(parse_attachment_point, one)
+    stages["parse_spread"] = run_all(parse_spread, one)
+    stages["check_multiple_tranche"] = run_all(check_multiple_tranche, one)
+    stages["parse_tranche_details"] = run_all(
+        parse_tranche_details, [(deal["description"],) for deal in multi]
+    )
+    stages["tranche_sequencing"] = run_all(
+        find_tranche_sequence,
+        [
+            (deal["description"], deal["total_size_million"], deal["tranches"])
+            for deal in sized
+        ],
+    )
+    stages["write_rows"] = write_rows
+    stages["format_sheet"] = lambda: format_sheet(formatted.active)
+    stages["export_streaming"] = lambda: export_streaming(
+        export_path, SHEET_NAME, headers, rows
+    )
+    stages["store_insert"] = store_rows
+    return stages, export_path
+
+
+def current_commit():
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPOSITORY,
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def run_benchmark(
+    corpus_path=EXAMPLE_CORPUS,
+    pages_source=EXAMPLE_PAGES,
+    rounds=5,
+    results_path="benchmark_results.json",
+    threshold=0.10,
+):
+    # Times every stage, appends the results to `results_path` and returns the stages
+    # slower than in the last run over the same corpus by more than `threshold`
+    rows, corpus, pages, directory_pages = load_benchmark_corpus(
+        corpus_path, pages_source
+    )
+    print(
+        f"Benchmark corpus: {len(corpus)} deals, {len(rows)} rows, {len(pages)} deal "
+        f"pages, {len(directory_pages)} directory pages"
+    )
+    stages, export_path = benchmark_stages(
+        rows, corpus, pages, directory_pages, results_path
+    )
+    results = OrderedDict()
+    # The parsers print as they go; that output is not part of the measurement
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name, function in stages.items():
+            results[name] = time_stage(function, rounds)
+    if os.path.exists(export_path):
+        os.remove(export_path)
+
+    history = []
+    if os.path.exists(results_path):
+        with open(results_path, encoding="utf-8") as f:
+            history = json.load(f)
+    corpus_size = {
+        "deals": len(corpus),
+        "rows": len(rows),
+        "pages": len(pages),
+        "directory_pages": len(directory_pages),
+    }
+    # Compared with the last run over the same corpus, on the fastest round, which is
+    # the least affected by noise from other processes
+    previous = {}
+    for run in reversed(history):
+        if run["corpus"] == corpus_size:
+            previous = run["stages"]
+            break
+
+    regressions = []
+    print(f"{'Stage':<32}{'Median ms':>11}{'Min ms':>10}{'Previous':>10}{'Change':>9}")
+    for name, stats in results.items():
+        line = f"{name:<32}{1000 * stats['median']:>11.2f}{1000 * stats['min']:>10.2f}"
+        if name in previous and previous[name]["min"] > 0:
+            change = stats["min"] / previous[name]["min"] - 1
+            line += f"{1000 * previous[name]['min']:>10.2f}{change:>+9.0%}"
+            if change > threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    history.append(
+        {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": current_commit(),
+            "corpus": corpus_size,
+            "stages": results,
+        }
+    )
+    with open(results_path, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2)
+    print(f"Results appended to {results_path}")
+    if regressions:
+        print(
+            f"{len(regressions)} stages slower than the previous run by more than "
+            f"{threshold:.0%}: {', '.join(regressions)}"
+        )
+    return regressions
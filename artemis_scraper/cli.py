@@ -0,0 +1,185 @@
+# Command line entry point (python -m artemis_scraper). Everything is configured from
+# config.ini and the flags below; nothing is asked interactively.
+
+import os
+import sys
+import argparse
+import configparser
+
+from . import extraction
+from .metrics import RunMetrics
+
+MODES = ["scrape", "reparse", "parse_benchmark", "benchmark", "pricing"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m artemis_scraper",
+        description="Scrape the Artemis deal directory into Transactions_Chart.xlsx.",
+    )
+    parser.add_argument(
+        "--config",
+        default="config.ini",
+        help="configuration file, read before changing directory (default: config.ini)",
+    )
+    parser.add_argument(
+        "--workdir",
+        help="working directory (default: working_directory in the configuration, "
+        "or the current directory)",
+    )
+    parser.add_argument("--mode", choices=MODES, help="overrides mode in [Settings]")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue an interrupted scrape: deals in its journal are not fetched again",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="overrides a [Settings] value; can be given more than once",
+    )
+    return parser, parser.parse_args(argv)
+
+
+def load_config(path, overrides=()):
+    # config.ini with the --set overrides applied to its [Settings] section
+    config = configparser.ConfigParser()
+    config.read(path)
+    if "Settings" not in config:
+        config.add_section("Settings")
+    for override in overrides:
+        key, separator, value = override.partition("=")
+        if not separator:
+            raise ValueError(f"--set expects KEY=VALUE, got '{override}'")
+        config.set("Settings", key.strip(), value.strip())
+    return config
+
+
+def run_reparse(config):
+    from .reparse import reparse
+    from .store import open_store
+
+    store_path = config.get("Settings", "store_path", fallback="Transactions.sqlite")
+    store = open_store(store_path) if store_path else None
+    reparse(
+        store,
+        source=config.get("Settings", "reparse_source", fallback=""),
+        output=config.get(
+            "Settings", "reparse_output", fallback="Transactions_Reparsed.xlsx"
+        ),
+        workers=config.getint(
+            "Settings", "reparse_workers", fallback=os.cpu_count() or 1
+        ),
+        diff_file=config.get("Settings", "reparse_diff_file", fallback=""),
+        update_store=config.getboolean(
+            "Settings", "reparse_update_store", fallback=False
+        ),
+    )
+    if store is not None:
+        store.close()
+    return 0
+
+
+def run_parse_benchmark(config):
+    # Micro-benchmark of the page parsers over the saved pages in reparse_source
+    from .reparse import benchmark_page_parsers, saved_pages
+
+    benchmark_page_parsers(
+        saved_pages(config.get("Settings", "reparse_source", fallback="")),
+        ["html.parser", "lxml"] if extraction.LXML_INSTALLED else ["html.parser"],
+        repeat=config.getint("Settings", "benchmark_repeat", fallback=3),
+    )
+    return 0
+
+
+def run_benchmark(config):
+    from .benchmark import EXAMPLE_CORPUS, EXAMPLE_PAGES, run_benchmark
+
+    regressions = run_benchmark(
+        corpus_path=config.get("Settings", "benchmark_corpus", fallback=EXAMPLE_CORPUS),
+        pages_source=config.get(
+            "Settings",
+            "benchmark_pages",
+            fallback=config.get("Settings", "reparse_source", fallback=EXAMPLE_PAGES),
+        ),
+        rounds=config.getint("Settings", "benchmark_rounds", fallback=5),
+        results_path=config.get(
+            "Settings", "benchmark_results", fallback="benchmark_results.json"
+        ),
+        threshold=config.getfloat("Settings", "benchmark_threshold", fallback=0.10),
+    )
+    return 1 if regressions else 0
+
+
+def run_pricing(config):
+    # Pricing chart from the store, or from the workbook when there is no store
+    from .columns import WORKBOOK_FILENAME, SHEET_NAME
+    from .pricing import pricing_from_config
+    from .store import open_store, read_sheet_rows
+
+    store_path = config.get("Settings", "store_path", fallback="Transactions.sqlite")
+    if store_path:
+        store = open_store(store_path)
+        pricing_from_config(config, store.iter_rows())
+        store.close()
+    else:
+        pricing_from_config(config, read_sheet_rows(WORKBOOK_FILENAME, SHEET_NAME))
+    return 0
+
+
+def run_scrape(config):
+    from .scrape import scrape
+
+    # Optional outputs: a JSON line per deal, and the run's totals as JSON and in the
+    # Prometheus text format
+    metrics = RunMetrics(config.get("Settings", "metrics_trace", fallback=""))
+    metrics_json = config.get("Settings", "metrics_json", fallback="")
+    metrics_prometheus = config.get("Settings", "metrics_prometheus", fallback="")
+    try:
+        scrape(config, metrics)
+    finally:
+        metrics.print_summary()
+        if metrics_json:
+            metrics.write_json(metrics_json)
+        if metrics_prometheus:
+            metrics.write_prometheus(metrics_prometheus)
+        metrics.close()
+    return 0
+
+
+def main(argv=None):
+    parser, args = parse_args(argv)
+    try:
+        config = load_config(
+            args.config, args.set + (["resume=yes"] if args.resume else [])
+        )
+    except (ValueError, configparser.Error) as e:
+        parser.error(str(e))
+
+    # Change the working directory
+    directory = args.workdir or config.get("Settings", "working_directory", fallback="")
+    if directory:
+        if not os.path.isdir(directory):
+            parser.error(f"working directory {directory} does not exist")
+        os.chdir(directory)
+    print(f"Current working directory: {os.getcwd()}")
+
+    extraction.configure(config)
+    mode = args.mode or config.get("Settings", "mode", fallback="scrape")
+    if mode == "reparse":
+        return run_reparse(config)
+    if mode == "parse_benchmark":
+        return run_parse_benchmark(config)
+    if mode == "benchmark":
+        return run_benchmark(config)
+    if mode == "pricing":
+        return run_pricing(config)
+    if mode != "scrape":
+        parser.error(f"unknown mode '{mode}', expected one of {', '.join(MODES)}")
+    return run_scrape(config)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# Layout of the Transactions sheet and of the local store
+
+from collections import OrderedDict
+
+
+# Workbook written in the working directory and its sheet
+WORKBOOK_FILENAME = "Transactions_Chart.xlsx"
+SHEET_NAME = "Transactions"
+
+# Headers for the sheet
+headers = [
+    "Deal",
+    "Date of issue",
+    "Issuer",
+    "Sponsor",
+    "Placement / structuring agent/s",
+    "Risk modelling / calculation agents",
+    "Risks / perils covered",
+    "Size",
+    "Trigger type",
+    "Ratings",
+    "Maturity",
+    "Attachment Probability",
+    "Attachment Point",
+    "Multiple Tranche",
+    "Expected Loss",
+    "Spread",
+    "Risk Multiple",
+    "Deal Closed",
+    "IBRD",
+    "Description",
+    "Link",
+]
+
+# Column names of the local store, one per sheet header (the schema must stay in sync)
+STORE_COLUMNS = OrderedDict(
+    [
+        ("Deal", "deal"),
+        ("Date of issue", "date_of_issue"),
+        ("Issuer", "issuer"),
+        ("Sponsor", "sponsor"),
+        ("Placement / structuring agent/s", "placement_structuring_agents"),
+        ("Risk modelling / calculation agents", "risk_modelling_calculation_agents"),
+        ("Risks / perils covered", "risks_perils_covered"),
+        ("Size", "size"),
+        ("Trigger type", "trigger_type"),
+        ("Ratings", "ratings"),
+        ("Maturity", "maturity"),
+        ("Attachment Probability", "attachment_probability"),
+        ("Attachment Point", "attachment_point"),
+        ("Multiple Tranche", "multiple_tranche"),
+        ("Expected Loss", "expected_loss"),
+        ("Spread", "spread"),
+        ("Risk Multiple", "risk_multiple"),
+        ("Deal Closed", "deal_closed"),
+        ("IBRD", "ibrd"),
+        ("Description", "description"),
+        ("Link", "link"),
+    ]
+)
+assert list(STORE_COLUMNS) == headers
@@ -0,0 +1,271 @@
+# Excel output: formatting of the Transactions sheet, in-place row insertion and the
+# streaming write-only export
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import PatternFill, Border, Side, Alignment, Font, NamedStyle
+from openpyxl.utils import get_column_letter
+from itertools import islice
+
+import os
+import re
+import datetime
+
+from .columns import headers
+
+
+# Styles shared by the in-place formatting and the streaming export
+yellow_fill = PatternFill(start_color="FFFF99", end_color="FFFF99", fill_type="solid")
+header_fill = PatternFill(start_color="3498DB", end_color="3498DB", fill_type="solid")
+header_font = Font(color="FFFFFF", bold=True)
+thin_border = Border(
+    left=Side(style="thin"),
+    right=Side(style="thin"),
+    top=Side(style="thin"),
+    bottom=Side(style="thin"),
+)
+header_border = Border(
+    left=Side(style="thin"),
+    right=Side(style="thin"),
+    top=Side(style="thin"),
+    bottom=Side(style="thick", color="FFFFFF"),
+)
+column_width = 35  # Example width, adjust as needed
+header_row_height = 25  # Adjust the height value as needed
+
+
+def format_sheet(ws):
+    # Set the font of the first row to bold
+    bold_font = Font(bold=True)
+    for cell in ws["1:1"]:
+        cell.font = bold_font
+
+    # make the Multiple tranche deals highlighted yellow
+    # Loop through the rows and apply yellow fill if the tranche "Size" is "ERROR"
+    for row in ws.iter_rows(min_row=2, max_col=ws.max_column, max_row=ws.max_row):
+        if row[7].value == "ERROR":
+            for cell in row:
+                cell.fill = yellow_fill
+
+    # Apply styles to the header row
+    for cell in ws["1:1"]:
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+
+    # Set the width of each column to a custom value
+    for col in ws.columns:
+        column = col[0].column_letter  # Get the column letter
+        ws.column_dimensions[column].width = column_width
+
+    # Set the height of the header row
+    ws.row_dimensions[1].height = header_row_height
+
+    # Apply thin border to all cells in  worksheet
+    for row in ws.iter_rows():
+        for cell in row:
+            cell.border = thin_border
+
+    # Apply thick bottom border to Header
+    for cell in ws[1]:
+        cell.border = header_border
+
+
+def merged_rows(filename, sheet_name, headers, new_rows, after_row):
+    # Existing data rows with the new rows placed after `after_row` in reverse scrape
+    # order (the same layout write_new_rows produces), read lazily from the old file.
+    # Old rows are cut or padded to the width of the headers, as read_sheet_rows does
+    # (sheets edited by hand can report thousands of empty columns).
+    source = (
+        load_workbook(filename, read_only=True) if os.path.exists(filename) else None
+    )
+    if source is not None and sheet_name in source.sheetnames:
+        rows = (
+            values[: len(headers)] + (None,) * (len(headers) - len(values))
+            for values in source[sheet_name].iter_rows(
+                min_row=2, max_col=len(headers), values_only=True
+            )
+        )
+    else:
+        rows = iter(())
+    yield from islice(rows, after_row - 1)
+    yield from reversed(new_rows)
+    yield from rows
+    if source is not None:
+        source.close()
+
+
+def copied_row(ws, row):
+    # Write-only cells with the values and cell styles of a read-only row, without the
+    # empty unstyled cells at its end
+    cells = list(row)
+    while cells and cells[-1].value is None and not getattr(cells[-1], "has_style", 0):
+        cells.pop()
+    copied = []
+    for cell in cells:
+        new_cell = WriteOnlyCell(ws, value=cell.value)
+        if getattr(cell, "has_style", False):
+            new_cell.font = cell.font
+            new_cell.fill = cell.fill
+            new_cell.border = cell.border
+            new_cell.alignment = cell.alignment
+            new_cell.number_format = cell.number_format
+            new_cell.protection = cell.protection
+        copied.append(new_cell)
+    return copied
+
+
+def export_streaming(filename, sheet_name, headers, rows):
+    # Write the sheet with a write-only workbook: rows are streamed to disk as they are
+    # produced, every cell shares one of a few named styles and the "ERROR" highlight
+    # is a conditional format instead of a fill applied cell by cell. The other sheets
+    # of an existing file are streamed into the new workbook in their place, row by
+    # row with their values and cell styles (column widths, merged cells and charts
+    # of those sheets are not kept).
+    source = None
+    sheet_names = [sheet_name]
+    if os.path.exists(filename):
+        source = load_workbook(filename, read_only=True)
+        sheet_names = list(source.sheetnames)
+        if sheet_name not in sheet_names:
+            sheet_names.append(sheet_name)
+    wb = Workbook(write_only=True)
+    for name in sheet_names:
+        if name == sheet_name:
+            row_count = write_streaming_sheet(wb, sheet_name, headers, rows)
+        else:
+            copy = wb.create_sheet(name)
+            for row in source[name].iter_rows():
+                copy.append(copied_row(copy, row))
+
+    # Write next to the old file first since its rows are read while exporting
+    root, extension = os.path.splitext(filename)
+    temp_filename = f"{root}.tmp{extension}"
+    wb.save(temp_filename)
+    if source is not None:
+        source.close()
+    os.replace(temp_filename, filename)
+    return row_count
+
+
+def write_streaming_sheet(wb, sheet_name, headers, rows):
+    # The Transactions sheet of a write-only workbook; returns the number of rows
+    ws = wb.create_sheet(sheet_name)
+    header_style = NamedStyle(
+        name="Transactions Header",
+        font=header_font,
+        fill=header_fill,
+        border=header_border,
+        alignment=Alignment(horizontal="center", vertical="center"),
+    )
+    cell_style = NamedStyle(name="Transactions Cell", border=thin_border)
+    # A named style replaces the number format openpyxl gives dates, so dates need
+    # their own style to be read back as dates
+    date_style = NamedStyle(
+        name="Transactions Date", border=thin_border, number_format="yyyy-mm-dd h:mm:ss"
+    )
+    wb.add_named_style(header_style)
+    wb.add_named_style(cell_style)
+    wb.add_named_style(date_style)
+
+    last_column = get_column_letter(len(headers))
+    for column in range(1, len(headers) + 1):
+        ws.column_dimensions[get_column_letter(column)].width = column_width
+    ws.row_dimensions[1].height = header_row_height
+
+    def styled(value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        return cell
+
+    ws.append([styled(header, header_style.name) for header in headers])
+    row_count = 0
+    for row_data in rows:
+        ws.append(
+            [
+                styled(
+                    value,
+                    (
+                        date_style.name
+                        if isinstance(value, datetime.date)
+                        else cell_style.name
+                    ),
+                )
+                for value in row_data
+            ]
+        )
+        row_count += 1
+
+    if row_count:
+        ws.conditional_formatting.add(
+            f"A2:{last_column}{row_count + 1}",
+            FormulaRule(formula=['$H2="ERROR"'], fill=yellow_fill),
+        )
+
+    return row_count
+
+
+def write_new_rows(ws, rows, after_row):
+    # Rows used to be inserted one at a time directly below `after_row`, which leaves
+    # them in reverse scrape order ahead of any rows that were already below it.
+    # Keep that layout, but shift the rows below only once for the whole block.
+    if not rows:
+        return
+    if after_row < ws.max_row:
+        ws.insert_rows(after_row + 1, amount=len(rows))
+    for offset, row_data in enumerate(reversed(rows), start=1):
+        for col, value in enumerate(row_data, start=1):
+            ws.cell(row=after_row + offset, column=col, value=value)
+
+
+def find_last_closed_deal(filename, sheet_name):
+    # Scan the sheet once in read-only mode for the last row of a closed deal
+    last_deal_name = None
+    last_row = 1
+    source = load_workbook(filename, read_only=True)
+    if sheet_name in source.sheetnames:
+        for row_index, values in enumerate(
+            source[sheet_name].iter_rows(values_only=True), start=1
+        ):
+            if len(values) >= 18 and values[0] and values[17] == 1:
+                last_deal_name = re.split(r"\s+Class", values[0].strip())[0]
+                last_row = row_index
+    source.close()
+    return last_deal_name, last_row
+
+
+def open_workbook(filename, sheet_name):
+    # The workbook and sheet edited in place, the last closed deal found in it and the
+    # sheet row new rows go after; a new workbook with headers if there is none
+    last_deal_name = None
+    original_last_row = None
+    if os.path.exists(filename):
+        wb = load_workbook(filename)
+        if sheet_name in wb.sheetnames:
+            ws = wb[sheet_name]
+            for row in reversed(range(1, ws.max_row + 1)):
+                cell_value = ws.cell(row=row, column=1).value
+                deal_closed = ws.cell(row=row, column=18).value
+                if cell_value and deal_closed == 1:
+                    last_deal_name = re.split(r"\s+Class", cell_value.strip())[0]
+                    original_last_row = row
+                    break
+            # If no deals are found, set original_last_row to the row after the headers
+            if original_last_row is None:
+                original_last_row = 1
+        else:
+            ws = wb.create_sheet(sheet_name)
+            ws.append(headers)
+            original_last_row = 1  # Set the original last row to the header row
+        print(
+            "Last Closed Deal Found: ", last_deal_name, ", at row: ", original_last_row
+        )
+    else:
+        wb = Workbook()
+        ws = wb.active
+        ws.title = sheet_name
+        ws.append(headers)
+        original_last_row = 1  # Header row
+        print("New File Created")
+    return wb, ws, last_deal_name, original_last_row
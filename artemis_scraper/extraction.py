@@ -0,0 +1,1119 @@
+# Extraction of the deal fields from a deal page and its description. Importing this
+# module only compiles the patterns: the settings of config.ini are applied by
+# configure(), and the HTML parsers are imported when a page is first read.
+
+from dateutil.relativedelta import relativedelta
+from collections import OrderedDict
+
+import re
+import time
+import datetime
+import importlib.util
+
+from .patterns import PATTERNS, GATES
+from .phrases import PHRASES
+from .records import Deal, Tranche, TrancheSequence, format_amount
+
+
+# Define the Advanced Functions Needed To Scrape Information from Description
+def format_size(text):
+
+    if "Size:" in text:
+        # Extract the value after "Size:"
+        size_value = text.split("Size:")[1].strip()
+
+        # Check for currency symbol
+        currency_symbol = ""
+        if size_value.startswith(("$", "€", "£")):
+            currency_symbol = size_value[0]
+            size_value = size_value[1:]
+
+        # Convert to numeric value
+        if size_value.endswith("m"):
+            numeric_value = float(size_value[:-1]) * 1e6
+        elif size_value.endswith("b"):
+            numeric_value = float(size_value[:-1]) * 1e9
+        else:
+            # Handle the case where value is just a number without 'm' or 'b'
+            numeric_value = float(size_value)
+
+        # Format the value to avoid scientific notation
+        formatted_value = f"{currency_symbol}{numeric_value:,.2f}"
+        return formatted_value
+    else:
+        return "Size not found"
+
+
+# Regular expression to find "attachment probability of x%"
+PATTERNS.register(
+    "attachment_probability",
+    r"attachment probability of (\d+(\.\d+)?)%",
+    re.IGNORECASE,
+)
+GATES.register(
+    "attachment_probability",
+    [("attachment probability of",), ("%",)],
+    ["attachment_probability"],
+)
+
+
+def parse_attachment_probability(description):
+    if not GATES.allows("attachment_probability", description):
+        return "None"
+    probability_match = PATTERNS["attachment_probability"].search(description)
+
+    if probability_match:
+        # Extract and return the probability value
+        return float(probability_match.group(1))
+    else:
+        # Return a default or indicative value (e.g., None) if not found
+        return "None"
+
+
+# Regular expression to find "attachment point of x% of losses"
+PATTERNS.register(
+    "attachment_point",
+    r"attachment point.*?([\$€£]?)\s*(\d+(\.\d+)?)( million| billion)? of losses",
+    re.IGNORECASE,
+)
+GATES.register(
+    "attachment_point", [("attachment point",), ("of losses",)], ["attachment_point"]
+)
+
+
+def attachment_point_amount(description):
+    # (amount, currency symbol) of the attachment point, or None if not found
+    if not GATES.allows("attachment_point", description):
+        return None
+    probability_match = PATTERNS["attachment_point"].search(description)
+
+    if probability_match:
+        # Extract the currency symbol, numeric value, and the scale (million or billion)
+        currency_symbol = probability_match.group(1)
+        numeric_value = probability_match.group(2)
+        scale = probability_match.group(4)
+
+        # Convert the numeric value to float
+        value = float(numeric_value)
+
+        # Adjust the value based on the scale
+        if scale:
+            if "million" in scale:
+                value *= 1e6
+            elif "billion" in scale:
+                value *= 1e9
+        return value, currency_symbol
+    return None
+
+
+def parse_attachment_point(description):
+    amount = attachment_point_amount(description)
+    if amount is not None:
+        # Format the value to avoid scientific notation and prepend the currency symbol
+        value, currency_symbol = amount
+        return format_amount(value, currency_symbol)
+    else:
+        # Return a default or indicative value (e.g., None) if not found
+        return "Unknown"
+
+
+# Regex patterns to capture various phrases for spread information. They are registered
+# as spread_0 ... spread_21; a pattern's index is part of parse_spread's priority rules.
+SPREAD_PATTERNS = [
+    PATTERNS.register(
+        "spread_0",
+        r"(?:spread|coupon|risk margin)(?:\s*\-?\s*equivalent)?\s*(?:to|of\s+)?(\d+(?:\.\d+)?)%",
+        re.IGNORECASE,
+    ),
+    PATTERNS.register(
+        "spread_1",
+        r"(?:spread|coupon|risk margin) to be paid to investors is (\d+(?:\.\d+)?)%",
+        re.IGNORECASE,
+    ),
+    PATTERNS.register(
+        "spread_2",
+        r"(?:spread|coupon|risk margin)\s+(?:fixed\s*)?(?:at|of\s+)?(\d+(?:\.\d+)?)%",
+        re.IGNORECASE,
+    ),
+    PATTERNS.register(
+        "spread_3", r"(\d+(?:\.\d+)?)% (?:spread|coupon|risk margin)", re.IGNORECASE
+    ),
+    PATTERNS.register(
+        "spread_4",
+        r"(?:priced|settle[d]?|finali[sz]ed|fixed)\s+.*?(\d+(?:\.\d+)?)\s*%",
+        re.IGNORECASE | re.DOTALL,
+    ),
+    PATTERNS.register(
+        "spread_5",
+        r"guidance(?:,)? (?:at|of) (\d+(?:,\d+)?(?:\.\d+)?)%", re.IGNORECASE
+    ),
+    PATTERNS.register(
+        "spread_6",
+        r"(?:just)?\s*(above|below)\s*the\s*(?:initial|final)?\s*mid-?point\s*(?:at|of)\s*(\d+(?:\.\d+)?)%",
+        re.IGNORECASE,
+    ),
+    PATTERNS.register(
+        "spread_7", r"pricing (?:at|of) (\d+(?:\.\d+)?)%", re.IGNORECASE
+    ),
+    PATTERNS.register(
+        "spread_8",
+        r"(?:spread|coupon|risk margin) (:?level\s*)(?:at|of) (\d+(?:\.\d+)?)%",
+        re.IGNORECASE,
+    ),
+    PATTERNS.register(
+        "spread_9",
+        r"(?:settling|pricing|spread|coupon|risk margin)\s*(?:fixed|settled|finalized|determined)?\s*(?:\sat)?(?:\sthe)?(?:\s(?:raised|lowered))?\s*(?:level)?(?:\sat|\sof)?\s*(\d+(?:\.\d+)?)%",
+        re.IGNORECASE,
+    ),
+    # Other patterns specifically for basis points
+    PATTERNS.register(
+        "spread_10",
+        r"(?:spread|coupon|risk margin)(?:\s*\-?\s*equivalent)?\s*(?:to|of\s+)?(\d+(?:,\d+)?(?:\.\d+)?)\s*(bps|basis points)",
+        re.IGNORECASE,
+    ),
+    PATTERNS.register(
+        "spread_11",
+        r"(?:spread|coupon|risk margin) to be paid to investors is (\d+(?:,\d+)?(?:\.\d+)?)\s*(bps|basis points)",
+        re.IGNORECASE,
+    ),
+    PATTERNS.register(
+        "spread_12",
+        r"(?:priced|settle?d|finali[sz]ed|fixed)\s+.*?(\d+(?:\.\d+)?)\s*(bps|basis points)",
+        re.IGNORECASE | re.DOTALL,
+    ),
+    PATTERNS.register(
+        "spread_13",
+        r"guidance(?:,)? (?:at|of) (\d+(?:,\d+)?(?:\.\d+)?)\s*(bps|basis points)",
+        re.IGNORECASE,
+    ),
+    PATTERNS.register(
+        "spread_14",
+        r"(?:just)?\s*(above|below)\s*the\s*(?:initial|final)?\s*mid-?point\s*(?:at|of)\s*(\d+)\s*(bps|basis points)",
+        re.IGNORECASE,
+    ),
+    PATTERNS.register(
+        "spread_15", r"pricing (?:at|of) (\d+)\s*(bps|basis points)", re.IGNORECASE
+    ),
+    PATTERNS.register(
+        "spread_16",
+        r"(?:spread|coupon|risk margin)\s+(?:level\s+)?(?:at|of)\s+(\d+)\s*(bps|basis points)?",
+        re.IGNORECASE,
+    ),
+    PATTERNS.register(
+        "spread_17",
+        r"(?:SOFR|LIBOR)\s*(?:\+|plus)?\s*(\d+(?:\.\d+)?)\s*(bps|basis points)?",
+        re.IGNORECASE,
+    ),
+    PATTERNS.register(
+        "spread_18",
+        r"(?:settling|pricing)\s+(?:remained\s+)?(?:fixed\s+)?at\s+?the\s+(?:raised|lowered)\s+(?:(bps|basis points))?",
+        re.IGNORECASE,
+    ),
+    PATTERNS.register(
+        "spread_19",
+        r"(?:settling|pricing|spread|coupon|risk margin)\s*(?:remained\s+)?(?:fixed|settled|finalized|determined)?\s*(?:\sat)?(?:\sthe)?(?:\s(?:raised|lowered))?\s*(?:level)?(?:\sat|\sof)?\s*(?:(bps|basis points))?",
+        re.IGNORECASE,
+    ),
+    # Other pattern
+    PATTERNS.register(
+        "spread_20", r"(\d+(?:\.\d+)?)% rate-on-line", re.IGNORECASE
+    ),
+    PATTERNS.register(
+        "spread_21", r"(\d+(?:\.\d+)?)%\s+(coupon|spread|risk margin)", re.IGNORECASE
+    ),
+]
+
+# Indices of the patterns whose matches take precedence over all others
+PRIORITY_SPREAD_PATTERNS = (0, 11, 17, 20, 21)
+
+# A single scan finds every keyword a spread pattern can start with. Each pattern is then
+# only tried at those positions, which gives exactly the matches finditer would find.
+SPREAD_KEYWORDS = PATTERNS.register(
+    "spread_keywords",
+    r"(?=(?P<scr>spread|coupon|risk margin)|(?P<settl>settl)|(?P<pric>pric)"
+    r"|(?P<final>finali[sz]ed)|(?P<fixed>fixed)|(?P<guidance>guidance)"
+    r"|(?P<above_below>above|below)|(?P<benchmark>SOFR|LIBOR)"
+    r"|(?P<bps>bps|basis points)|(?P<percent>%))",
+    re.IGNORECASE,
+)
+SPREAD_KEYWORD_PATTERNS = {
+    "scr": (0, 1, 2, 8, 9, 10, 11, 16, 19),
+    "settl": (4, 9, 12, 18, 19),
+    "pric": (4, 7, 9, 12, 15, 18, 19),
+    "final": (4, 12),
+    "fixed": (4, 12),
+    "guidance": (5, 13),
+    "benchmark": (17,),
+}
+# Patterns starting with the number in front of a "%" sign
+PERCENT_LED_SPREAD_PATTERNS = (3, 20, 21)
+# Patterns starting with an optional "just" and whitespace in front of "above"/"below"
+ABOVE_BELOW_SPREAD_PATTERNS = (6, 14)
+JUST_PATTERN = PATTERNS.register("spread_just", r"just", re.IGNORECASE)
+
+
+# A spread pattern can only match at one of the keywords above
+GATES.register(
+    "spread",
+    [
+        (
+            "spread",
+            "coupon",
+            "risk margin",
+            "settl",
+            "pric",
+            "finali",
+            "fixed",
+            "guidance",
+            "above",
+            "below",
+            "sofr",
+            "libor",
+            "%",
+        )
+    ],
+    ["spread_keywords"] + [pattern.name for pattern in SPREAD_PATTERNS],
+)
+
+
+def spread_candidates(description):
+    # Map each pattern index to the sorted positions a match could start at
+    candidates = [[] for _ in SPREAD_PATTERNS]
+    last_percent = last_bps = -1
+    for hit in SPREAD_KEYWORDS.finditer(description):
+        kind = hit.lastgroup
+        position = hit.start()
+        if kind in SPREAD_KEYWORD_PATTERNS:
+            for i in SPREAD_KEYWORD_PATTERNS[kind]:
+                candidates[i].append(position)
+        elif kind == "percent":
+            last_percent = position
+            start = position
+            while start > 0 and (
+                description[start - 1].isdecimal() or description[start - 1] == "."
+            ):
+                start -= 1
+            for i in PERCENT_LED_SPREAD_PATTERNS:
+                candidates[i].extend(range(start, position))
+        elif kind == "bps":
+            last_bps = position
+        elif kind == "above_below":
+            start = position
+            while start > 0 and description[start - 1].isspace():
+                start -= 1
+            extra = (
+                [start - 4]
+                if start >= 4 and JUST_PATTERN.match(description, start - 4)
+                else []
+            )
+            for i in ABOVE_BELOW_SPREAD_PATTERNS:
+                candidates[i].extend(extra + list(range(start, position + 1)))
+    for i in PERCENT_LED_SPREAD_PATTERNS + ABOVE_BELOW_SPREAD_PATTERNS:
+        candidates[i].sort()
+    return candidates, last_percent, last_bps
+
+
+def spread_pattern_matches(pattern, description, candidates, limit):
+    # Equivalent to pattern.finditer(description), trying only the candidate positions.
+    # A pattern overridden from config has unknown anchors and is scanned in full.
+    if pattern.overridden:
+        yield from pattern.finditer(description)
+        return
+    end = 0
+    for start in candidates:
+        if start >= limit:
+            break
+        if start < end:
+            continue
+        match = pattern.match(description, start)
+        if match:
+            end = match.end()
+            yield match
+
+
+def parse_spread(description):
+    if not GATES.allows("spread", description):
+        return "NA"
+    candidates, last_percent, last_bps = spread_candidates(description)
+
+    # List to store rates and their positions
+    matches = []
+
+    # Check all patterns and store results
+    for i, pattern in enumerate(SPREAD_PATTERNS):
+        # The lazy "priced ... x%" / "priced ... x bps" patterns need a later "%" or
+        # "bps", so they are not tried where they would scan to the end of the text
+        if i == 4:
+            limit = last_percent
+        elif i == 12:
+            limit = last_bps
+        else:
+            limit = len(description)
+        for match in spread_pattern_matches(
+            pattern, description, candidates[i], limit
+        ):
+            groups = match.groups()
+            rate = groups[0]
+            unit = groups[1] if len(groups) > 1 and groups[1] is not None else None
+
+            if rate:
+                rate = float(rate.replace(",", ""))
+                if unit in ("bps", "basis points"):
+                    rate /= 100  # Convert basis points to percentages
+                elif rate > 100:
+                    rate /= 100  # Normalize rates that are presumably not in basis points but are too high
+
+                # Store match with its start position and pattern index
+                matches.append((rate, match.start(), i))
+
+    # Sort matches by position and then by pattern priority
+    matches.sort(key=lambda x: (x[1], -x[2]))
+
+    # Prioritize the matches based on their pattern index (keeping specific indices as priority if needed)
+    prioritized = [m for m in matches if m[2] in PRIORITY_SPREAD_PATTERNS]
+    if prioritized:
+        return prioritized[-1][0]  # Return the last match from the prioritized list
+
+    # If no prioritized matches, return the last match found
+    return matches[-1][0] if matches else "NA"
+
+
+def check_multiple_tranche(description):
+    if PHRASES.has("structure.multiple_tranches", description):
+        return "Yes"
+    else:
+        return "No"
+
+
+# Regular expression to match the required phrases and capture the expected loss value
+PATTERNS.register(
+    "expected_loss",
+    r"expected loss\s*(?:\w+\s*){0,3}(?:was\s*|is\s*)?(?:set\s*at\s*|of\s*)?(?:\w+\s*){0,5}(\d+(\.\d+)?)(?:\s*%|\s*basis points|\s*bps)",
+    re.IGNORECASE,
+)
+GATES.register(
+    "expected_loss",
+    [("expected loss",), ("%", "basis points", "bps")],
+    ["expected_loss"],
+)
+
+
+def parse_expected_loss(description):
+    if not GATES.allows("expected_loss", description):
+        return "NA"
+    expected_loss_match = PATTERNS["expected_loss"].search(description)
+
+    if expected_loss_match:
+        # Extract the expected loss value and convert it to a float
+        value = float(expected_loss_match.group(1))
+        unit = expected_loss_match.group(
+            0
+        ).lower()  # Check the text within the match for unit
+        if "basis points" in unit or "bps" in unit:
+            value /= 100  # Convert basis points to percentage
+        return value
+    else:
+        # Return a default or indicative value (e.g., None) if not found
+        return "NA"
+
+
+# Explicit start and end dates
+PATTERNS.register("maturity_due", r"maturity due in (\w+ \d{4})", re.IGNORECASE)
+PATTERNS.register("maturity_start", r"starting from (\w+ \d{4})", re.IGNORECASE)
+# "over a three year term running from March 1st"
+PATTERNS.register(
+    "maturity_term_running",
+    r"over a (\d+|\b(?:one|two|three|four|five|six|seven|eight|nine|ten)\b) year term running from (\w+ \d{1,2})(st|nd|rd|th)?",
+    re.IGNORECASE,
+)
+# Term length relative to the issue date, optionally with an explicit end date
+PATTERNS.register(
+    "maturity_period",
+    r"(?:for|of|across|to the end of|term, being on-risk until the end of)?\s*"
+    r"((?:almost )?(?:\d+|\b(?:one|two|three|four|five|six|seven|eight|nine|ten)\b))\s*"
+    r"(years?|months?|year|month|calendar year term)(?: term| source)?(?: of protection)?"
+    r"(?: to the end of)?(?:.*?end of (\w+ \d{4}))?",
+    re.IGNORECASE,
+)
+GATES.register(
+    "maturity_dates",
+    [("maturity due in",), ("starting from",)],
+    ["maturity_due", "maturity_start"],
+)
+GATES.register(
+    "maturity_term_running",
+    [("year term running from",)],
+    ["maturity_term_running"],
+)
+GATES.register("maturity_period", [("year", "month")], ["maturity_period"])
+
+
+def parse_maturity(description, date_of_issue):
+
+    def word_to_number(word):
+        mapping = {
+            "one": 1,
+            "two": 2,
+            "three": 3,
+            "four": 4,
+            "five": 5,
+            "six": 6,
+            "seven": 7,
+            "eight": 8,
+            "nine": 9,
+            "ten": 10,
+            # ... Add more mappings as needed
+        }
+        if word.startswith("almost "):
+            number_word = word.split(" ")[1]
+            return (
+                mapping.get(number_word.lower()) - 1
+                if mapping.get(number_word.lower())
+                else None
+            )
+        else:
+            return mapping.get(word.lower())
+
+    def extract_date(date_string):
+        try:
+            return datetime.datetime.strptime(date_string, "%B %d %Y")
+        except ValueError:
+            # If above fails, it means the date may be in "Month Year" format
+            try:
+                return datetime.datetime.strptime(date_string, "%B %Y")
+            except ValueError as e:
+                print(f"Error parsing date '{date_string}': {e}")
+                return None
+
+    # Check for explicit start and end dates
+    maturity_match = start_match = None
+    if GATES.allows("maturity_dates", description):
+        maturity_match = PATTERNS["maturity_due"].search(description)
+        start_match = PATTERNS["maturity_start"].search(description)
+
+    if maturity_match and start_match:
+        maturity_date = extract_date(maturity_match.group(1))
+        start_date = extract_date(start_match.group(1))
+
+        if maturity_date and start_date:
+            delta = relativedelta(maturity_date, start_date)
+            total_years = delta.years + delta.months / 12 + delta.days / 365.25
+            return round(total_years, 2)
+
+    # Additional pattern for "over a three year term running from March 1st"
+    additional_match = None
+    if GATES.allows("maturity_term_running", description):
+        additional_match = PATTERNS["maturity_term_running"].search(description)
+
+    if additional_match:
+        period_value = additional_match.group(1)
+        start_date_str = additional_match.group(2)
+        current_year = datetime.datetime.now().year
+        start_date = extract_date(f"{start_date_str} {current_year}")
+
+        if start_date:
+            if period_value.isalpha():
+                period_value = word_to_number(period_value)
+                if period_value is None:
+                    return "Invalid period value"
+
+            if isinstance(period_value, str):
+                try:
+                    period_value = int(period_value)
+                except ValueError:
+                    return "Invalid period value"
+
+            maturity_date = start_date + relativedelta(years=int(period_value))
+            delta = relativedelta(maturity_date, start_date)
+            total_years = delta.years + delta.months / 12 + delta.days / 365.25
+            return round(total_years, 2)
+
+    # Original maturity logic based on issue date and period
+    try:
+        issue_date = datetime.datetime.strptime(date_of_issue, "%B %Y")
+    except ValueError as e:
+        print(f"Error parsing date '{date_of_issue}': {e}")
+        return "Invalid issue date"
+
+    period_match = None
+    if GATES.allows("maturity_period", description):
+        period_match = PATTERNS["maturity_period"].search(description)
+
+    if period_match:
+        period_value = period_match.group(1).strip()
+        period_unit = period_match.group(2).strip()
+        end_date_match = period_match.group(3)
+
+        if period_value.isalpha():
+            period_value = word_to_number(period_value)
+            if period_value is None:
+                return "Invalid period value"
+
+        if isinstance(period_value, str):
+            try:
+                period_value = int(period_value)
+            except ValueError:
+                return "Invalid period value"
+
+        if end_date_match:
+            try:
+                end_date = datetime.datetime.strptime(end_date_match, "%B %Y")
+            except ValueError:
+                return "Invalid pff"
+            if end_date < issue_date:
+                return "Invalid maturity range"
+            delta = relativedelta(end_date, issue_date)
+            total_years = delta.years + delta.months / 12
+            return round(total_years, 2)
+        else:
+            if "month" in period_unit.lower():
+                return round(period_value / 12, 2)
+            else:
+                return period_value
+    else:
+        return "Unknown"
+
+
+# Tranche anchors: "Class" and a tranche name such as "A", "1" or "A-1" that does not
+# run on into a word. Every anchor ends the text of the tranche before it.
+PATTERNS.register(
+    "tranche_anchor",
+    r"Class\s+([A-Z0-9a-z](?:[A-Z0-9\-]*[A-Z0-9a-z])?(?![a-z]{2}))",
+    re.IGNORECASE,
+)
+# Anchors that are not tranches ("Class of ...") and text that ends a tranche's
+# mention without a text ("Classes of ...")
+PATTERNS.register("tranche_not_a_name", r"(?:of|es of)\b", re.IGNORECASE)
+PATTERNS.register("tranche_classes_of", r"Classes\s+of", re.IGNORECASE)
+
+
+def tranche_segments(description):
+    # (name, text) of every tranche mention, from one scan for the anchors: the text
+    # of a mention is the slice up to the next anchor, and a mention whose text
+    # contains "Classes of" is dropped. Linear in the length of the description.
+    anchors = list(PATTERNS["tranche_anchor"].finditer(description))
+    segments = []
+    for index, anchor in enumerate(anchors):
+        if PATTERNS["tranche_not_a_name"].match(description, anchor.start(1)):
+            continue
+        if index + 1 < len(anchors):
+            end = anchors[index + 1].start()
+        else:
+            end = len(description)
+        if PATTERNS["tranche_classes_of"].search(description, anchor.end(), end):
+            continue
+        segments.append((anchor.group(1), description[anchor.end() : end]))
+    return segments
+
+
+def parse_tranche_details(description):
+    tranche_details = OrderedDict()
+
+    # Gather the texts of each tranche, appending the text of repeated mentions
+    for tranche_name, detail_text in tranche_segments(description):
+        if tranche_name not in tranche_details:
+            tranche_details[tranche_name] = detail_text.strip()
+        else:
+            # Append additional text if the tranche is mentioned again
+            tranche_details[tranche_name] += " " + detail_text.strip()
+
+    # Filter out overarching categories when specific subtranches are present: every
+    # prefix of a name before a "-" ("A" of "A-1") is a parent class
+    parents = set()
+    for tranche_name in tranche_details:
+        position = tranche_name.find("-")
+        while position != -1:
+            parents.add(tranche_name[:position])
+            position = tranche_name.find("-", position + 1)
+    final_tranche_names = [
+        tranche_name for tranche_name in tranche_details if tranche_name not in parents
+    ]
+
+    # Parsing details for the filtered tranches
+    parsed_tranches = []
+    for tranche_name in final_tranche_names:
+        details = tranche_details[tranche_name]
+        tranche = Tranche(
+            name=tranche_name,
+            text=details,
+            attachment_probability=found(parse_attachment_probability(details)),
+            expected_loss=found(parse_expected_loss(details)),
+            spread=found(parse_spread(details)),
+        )
+        amount = attachment_point_amount(details)
+        if amount is not None:
+            tranche.attachment_point, tranche.attachment_point_currency = amount
+        parsed_tranches.append(tranche)
+    parsed_tranches.reverse()
+
+    return parsed_tranches
+
+
+# Regular expression pattern to find monetary values mentioned in millions or billions
+PATTERNS.register(
+    "tranche_amount",
+    r"[\$€£]\s*([\d,]+(?:\.\d+)?)\s*(million|billion|m|b)",
+    re.IGNORECASE,
+)
+
+
+# Hard limits for the tranche size search (number of search steps and wall time)
+TRANCHE_SEARCH_MAX_STEPS = 200_000
+TRANCHE_SEARCH_MAX_SECONDS = 2.0
+TRANCHE_GRID_STEPS = 10  # Grid points per tolerance the amounts are rounded to
+
+
+class TrancheSearchBudgetExceeded(Exception):
+    pass
+
+
+def solve_tranche_sequence(
+    amounts,
+    total_size_million,
+    num_tranches,
+    tolerance=0.1,
+    max_steps=None,
+    max_seconds=None,
+):
+    # Find the first ordered selection of `num_tranches` amounts (in list order) whose sum
+    # is within tolerance of the total, as the original recursion did.
+    # The amounts are rounded to a grid of a tenth of the tolerance, and a table of bit
+    # sets records the grid sums that `count` amounts from index i onwards can make
+    # (bit s of reachable[count][i]); building it costs num_tranches * len(amounts)
+    # shifts of integers no wider than the total. The selection is then built taking at
+    # each step the first amount after which the rest can still reach the total on the
+    # grid, and checked with the float comparisons of the original recursion, so sums
+    # landing exactly on the tolerance are accepted or rejected as before. Grid rounding
+    # can let through a selection those comparisons reject; the search then steps back,
+    # and these steps are what `max_steps` / `max_seconds` limit.
+    # Returns a TrancheSequence; the limits default to the configured ones.
+    if max_steps is None:
+        max_steps = TRANCHE_SEARCH_MAX_STEPS
+    if max_seconds is None:
+        max_seconds = TRANCHE_SEARCH_MAX_SECONDS
+    if num_tranches <= 0 or num_tranches > len(amounts):
+        return TrancheSequence("no_match")
+    deadline = time.perf_counter() + max_seconds
+
+    unit = tolerance / TRANCHE_GRID_STEPS if tolerance > 0 else 1e-3
+    grid = [round(amount / unit) for amount in amounts]
+    target = round(total_size_million / unit)
+    # Rounding moves a sum of num_tranches amounts and the total by less than one grid
+    # point each, so a grid sum further than this from the target cannot match
+    slack = round(tolerance / unit) + num_tranches + 1
+    mask = (1 << (max(target + slack, 0) + 1)) - 1
+    reachable = [[1] * (len(amounts) + 1)]  # No amounts only make the sum 0
+    for count in range(1, num_tranches + 1):
+        fewer = reachable[-1]
+        sums = [0] * (len(amounts) + 1)
+        for i in reversed(range(len(amounts))):
+            sums[i] = sums[i + 1] | ((fewer[i + 1] << grid[i]) & mask)
+        reachable.append(sums)
+        if time.perf_counter() > deadline:
+            return TrancheSequence("budget_exceeded")
+
+    def can_reach(count, index, remaining):
+        low = max(remaining - slack, 0)
+        high = remaining + slack
+        if high < 0:
+            return False
+        return (reachable[count][index] >> low) & ((1 << (high - low + 1)) - 1) != 0
+
+    steps = 0
+
+    def search(remaining, remaining_grid, counts, index):
+        nonlocal steps
+        steps += 1
+        if steps > max_steps or (steps % 1024 == 0 and time.perf_counter() > deadline):
+            raise TrancheSearchBudgetExceeded()
+        for i in range(index, len(amounts)):
+            amount = amounts[i]
+            if counts == 1:
+                if abs(remaining - amount) <= tolerance:
+                    return [i]
+            elif amount <= remaining and can_reach(
+                counts - 1, i + 1, remaining_grid - grid[i]
+            ):
+                rest = search(
+                    remaining - amount, remaining_grid - grid[i], counts - 1, i + 1
+                )
+                if rest is not None:
+                    return [i] + rest
+        return None
+
+    if not can_reach(num_tranches, 0, target):
+        return TrancheSequence("no_match")
+    try:
+        indices = search(total_size_million, target, num_tranches, 0)
+    except TrancheSearchBudgetExceeded:
+        return TrancheSequence("budget_exceeded")
+    if indices:
+        return TrancheSequence("matched", [amounts[i] for i in indices])
+    return TrancheSequence("no_match")
+
+
+def find_tranche_sequence(description, total_size_million, num_tranches, tolerance=0.1):
+    # The amounts quoted in the description (in millions) that add up to the deal
+    # size, as a TrancheSequence
+    amounts = []
+    for match in PATTERNS["tranche_amount"].finditer(description):
+        value = float(match.group(1).replace(",", ""))
+        unit = match.group(2).lower()
+        if unit in ["million", "m"]:
+            value *= 1
+        elif unit in ["billion", "b"]:
+            value *= 1e3  # Convert billions to millions
+        if value <= total_size_million + tolerance:
+            amounts.append(value)
+
+    amounts.reverse()  # Reverse the list to start matching from the bottom up
+
+    result = solve_tranche_sequence(
+        amounts, total_size_million, num_tranches, tolerance
+    )
+    if result.status == "budget_exceeded":
+        print(
+            f"Tranche size search stopped after exceeding its budget "
+            f"({len(amounts)} amounts, {num_tranches} tranches)"
+        )
+    return result
+
+
+def size_tranches(description, size, size_note="Not determined"):
+    # Per-deal tranche stage: split the description into tranches and assign each one a
+    # size, searching for the tranche size sequence only once per deal. `size` is the
+    # deal size, or None with `size_note` saying why. Returns the tranches with the
+    # sequence, the match status and the time spent.
+    started = time.perf_counter()
+    tranche_details = parse_tranche_details(description)
+    total_size_numeric = None
+    tranche_sizes_sequence = None
+
+    # Attempt to find tranche sizes
+    # If not determine overall size, not determined tranche sizes
+    if size is None and size_note.lower() == "not issued":
+        status = "not_issued"
+        for tranche in tranche_details:
+            tranche.size_note = "Not issued"
+
+    elif size is None:
+        status = "size_not_determined"
+        # Assign 'Not determined' directly to all tranches if the original size is not determined
+        for tranche in tranche_details:
+            tranche.size_note = "Not determined"
+
+    else:
+        total_size_numeric = size / 1e6  # Convert to millions
+        search = find_tranche_sequence(
+            description, total_size_numeric, len(tranche_details)
+        )
+        status = search.status
+        tranche_sizes_sequence = search.sequence
+
+        # Check if the sizes sequence is found and if so assign sizes
+        if search.matched:
+            # Assign sizes to each tranche, converting millions to the full value
+            for tranche, tranche_size in zip(tranche_details, tranche_sizes_sequence):
+                tranche.size = tranche_size * 1_000_000
+        else:
+            # If no sizes sequence adds up or the search stopped, mark as "ERROR"
+            for tranche in tranche_details:
+                tranche.size_note = "ERROR"
+
+    return {
+        "tranches": tranche_details,
+        "total_size_million": total_size_numeric,
+        "sizes": tranche_sizes_sequence,
+        "status": status,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def print_tranche_debug(deal_name, tranche, tranche_stage):
+    print(deal_name)
+    print(len(tranche_stage["tranches"]))
+    print("Tranche Name:", tranche.name)
+    print("Attachment Probability:", tranche.attachment_probability)
+    print("Expected Loss:", tranche.expected_loss)
+    print("Spread:", tranche.spread if tranche.issued else "Not issued")
+    print("Attachment Point:", tranche.attachment_point)
+    print("Tranche Description Text:", [tranche.text])
+    print(f"Total size extracted: {tranche_stage['total_size_million']} million")
+    print(f"Tranche details parsed: {len(tranche_stage['tranches'])} tranches found")
+    print(f"Tranche sizes sequence: {tranche_stage['sizes']}")
+    print(
+        f"Tranche size match: {tranche_stage['status']} "
+        f"({tranche_stage['seconds'] * 1000:.1f} ms)"
+    )
+    print("-------------------------------------------")
+
+
+# Print the per-tranche debug output while scraping
+VERBOSE = False
+
+
+def parse_size_fact(size_value):
+    # "Size:" key fact, e.g. "$150m" -> size 150000000.0 in "$"
+    if VERBOSE:
+        print("Size:", size_value)
+    currency_symbol = ""
+    # Check for "Not Issued"
+    if "Not" in size_value:
+        return {"size": None, "currency": currency_symbol, "size_note": "Not Issued"}
+    # Check and assign known currency symbols
+    if size_value.startswith(("$", "€", "£", "NZ$", "A$", "C$")):
+        if size_value.startswith(("A$", "C$")):
+            currency_symbol = size_value[:2]  # Capture the two-character symbols
+            size_value = size_value[2:]  # Remove the currency symbol from the size
+        else:
+            currency_symbol = size_value[0]  # Capture the one-character symbols
+            size_value = size_value[1:]  # Remove the currency symbol from the size
+
+    # Use regular expressions to extract only numbers and decimal points
+    numeric_part = re.findall(r"[\d\.]+", size_value)
+    size = None
+    if numeric_part:
+        numeric_value_str = numeric_part[0]  # The first match should be the number
+        try:
+            # Check for 'm' or 'b' multiplier and adjust accordingly
+            if "m" in size_value.lower():
+                size = float(numeric_value_str) * 1e6
+            elif "b" in size_value.lower():
+                size = float(numeric_value_str) * 1e9
+            else:
+                size = float(numeric_value_str)
+        except ValueError:
+            size = None
+    return {"size": size, "currency": currency_symbol, "size_note": "Not determined"}
+
+
+def parse_issue_date_fact(date_of_issue):
+    # Parse abbreviated month names, e.g. "Jun 2023"
+    return {"date_of_issue": datetime.datetime.strptime(date_of_issue, "%b %Y")}
+
+
+def parse_perils_fact(perils):
+    if VERBOSE:
+        print("Risk Peril:", perils)
+    return {"perils": perils}
+
+
+# Key fact labels and the Deal field each one fills; facts that need more than the
+# text after the label have a parser returning the fields to set
+KEY_FACTS = {
+    "Issuer:": ("issuer", None),
+    "Cedent / sponsor: ": ("sponsor", None),
+    "Placement / structuring agent/s:": ("placement_agents", None),
+    "Risk modelling / calculation agents etc:": ("modelling_agents", None),
+    "Risks / perils covered:": ("perils", parse_perils_fact),
+    "Size:": ("size", parse_size_fact),
+    "Trigger type:": ("trigger_type", None),
+    "Ratings:": ("ratings", None),
+    "Date of issue:": ("date_of_issue", parse_issue_date_fact),
+}
+KEY_FACT_LABELS = re.compile("|".join(re.escape(label) for label in KEY_FACTS))
+
+
+def extract_deal_facts(fact_texts):
+    # Key facts of a deal page from the texts of its <li> bullet points, as Deal field
+    # values. Fields missing from the list keep the Deal defaults ("NA", no size or
+    # date) rather than whatever the previous deal had.
+    facts = {}
+    for text in fact_texts:
+        # One scan of the text finds its label(s), which pick the field to fill
+        for label in dict.fromkeys(KEY_FACT_LABELS.findall(text)):
+            value = text.split(label)[1].strip()
+            field, parser = KEY_FACTS[label]
+            if parser is None:
+                facts[field] = value
+            else:
+                facts.update(parser(value))
+    return facts
+
+
+# "lxml" (the default when it is installed) or "html.parser"
+LXML_INSTALLED = importlib.util.find_spec("lxml") is not None
+HTML_PARSER = "lxml" if LXML_INSTALLED else "html.parser"
+
+# Text inside these tags is not part of the page text (as in BeautifulSoup)
+LXML_TEXT = ".//text()[not(ancestor::script or ancestor::style or ancestor::template)]"
+LXML_PF_CONTENT = (
+    '//div[contains(concat(" ", normalize-space(@class), " "), " pf-content ")]'
+)
+
+
+def read_deal_page_lxml(page_source):
+    import lxml.html
+
+    document = lxml.html.fromstring(page_source)
+    info_boxes = document.xpath('//div[@id="info-box"]')
+    Deal_name = None
+    items = []
+    if info_boxes:
+        headings = info_boxes[0].xpath(".//h2")
+        # The title ends with " – at a glance"
+        Deal_name = (
+            "".join(headings[0].xpath(LXML_TEXT))[:-14].strip() if headings else "NA"
+        )
+        items = info_boxes[0].xpath(".//li")
+    items = items or document.xpath("//li")
+    fact_texts = ["".join(item.xpath(LXML_TEXT)) for item in items]
+    description_divs = document.xpath(LXML_PF_CONTENT)
+    if description_divs:
+        strings = (string.strip() for string in description_divs[0].xpath(LXML_TEXT))
+        description = " ".join(string for string in strings if string)
+    else:
+        description = "Description not found"
+    return Deal_name, fact_texts, description
+
+
+def read_deal_page_soup(page_source):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(page_source, "html.parser")
+    info_box = soup.find("div", id="info-box")
+    Deal_name = None
+    items = []
+    if info_box is not None:
+        heading = info_box.find("h2")
+        # The title ends with " – at a glance"
+        Deal_name = heading.text[:-14].strip() if heading is not None else "NA"
+        items = info_box.find_all("li")
+    items = items or soup.find_all("li")
+    fact_texts = [item.text for item in items]
+    description_div = soup.find("div", class_="pf-content")
+    description = (
+        " ".join(description_div.stripped_strings)
+        if description_div
+        else "Description not found"
+    )
+    return Deal_name, fact_texts, description
+
+
+def read_deal_page(page_source, parser=None):
+    # The title, key fact texts and description of a deal page; the title is None when
+    # the page has no #info-box. Only these parts are read: the key facts are the
+    # bullet points of #info-box (all bullet points of the page if it has none).
+    # With lxml the page is parsed in C; html.parser is the pure-Python fallback,
+    # also used for pages lxml rejects.
+    parser = parser or HTML_PARSER
+    if parser == "lxml":
+        import lxml.etree
+
+        try:
+            return read_deal_page_lxml(page_source)
+        except (ValueError, lxml.etree.ParserError):
+            pass
+    return read_deal_page_soup(page_source)
+
+
+def found(value):
+    # A parsed number, or None for the marker a parse_* function returns instead
+    return value if isinstance(value, (int, float)) else None
+
+
+def deal_from_facts(Deal_name, facts, description, link, deal_closed, trace=None):
+    # Deal record (with its tranches for multi-tranche deals) from the key facts and
+    # description of a deal page; everything parsed out of the description is derived
+    # here. Stage timings and the tranche match status are added to `trace` if given.
+    deal = Deal(
+        Deal_name, description=description, link=link, deal_closed=deal_closed, **facts
+    )
+    started = time.perf_counter()
+
+    # Add details that must be parsed
+    maturity = parse_maturity(description, deal.issue_date_text)
+    if isinstance(maturity, str):
+        deal.maturity_note = maturity
+    else:
+        deal.maturity = maturity
+    deal.attachment_probability = found(parse_attachment_probability(description))
+    deal.expected_loss = found(parse_expected_loss(description))
+    amount = attachment_point_amount(description)
+    if amount is not None:
+        deal.attachment_point, deal.attachment_point_currency = amount
+    deal.spread = found(parse_spread(description))
+
+    # Issuer type (IBRD deal), peril categories and structure as tags
+    tags = PHRASES.tags(deal.issuer, "issuer") + PHRASES.tags(deal.perils, "peril")
+    deal.ibrd = "issuer.ibrd" in tags
+
+    # Handle different tranches
+    deal.multiple_tranche = check_multiple_tranche(description) == "Yes"
+    if deal.multiple_tranche:
+        tags += ("structure.multiple_tranches",)
+    deal.tags = tuple(sorted(tags))
+    if trace is not None:
+        trace["seconds"]["description_regex"] = time.perf_counter() - started
+    if deal.multiple_tranche:
+        tranche_stage = size_tranches(description, deal.size, deal.size_note)
+        deal.tranches = tranche_stage["tranches"]
+        if trace is not None:
+            trace["seconds"]["tranche_stage"] = tranche_stage["seconds"]
+            trace["tranche_status"] = tranche_stage["status"]
+
+        for tranche in deal.tranches:
+            status = PHRASES.tags(tranche.text, "status")
+            if "status.pulled" in status:
+                tranche.status = "pulled"
+            elif "status.not_issued" in status:
+                tranche.status = "not_issued"
+            if VERBOSE:
+                print_tranche_debug(Deal_name, tranche, tranche_stage)
+    return deal
+
+
+def configure(config):
+    # Apply the [Settings] and [Patterns] sections of config.ini to the extraction
+    global VERBOSE, TRANCHE_SEARCH_MAX_STEPS, TRANCHE_SEARCH_MAX_SECONDS, HTML_PARSER
+    VERBOSE = config.getboolean("Settings", "verbose", fallback=False)
+    TRANCHE_SEARCH_MAX_STEPS = config.getint(
+        "Settings", "tranche_search_max_steps", fallback=200_000
+    )
+    TRANCHE_SEARCH_MAX_SECONDS = config.getfloat(
+        "Settings", "tranche_search_max_seconds", fallback=2.0
+    )
+    HTML_PARSER = config.get(
+        "Settings", "html_parser", fallback="lxml" if LXML_INSTALLED else "html.parser"
+    )
+    if HTML_PARSER == "lxml" and not LXML_INSTALLED:
+        print("lxml is not installed, pages are parsed with html.parser")
+        HTML_PARSER = "html.parser"
+    PATTERNS.load_overrides(config)
+    PATTERNS.profile = config.getboolean("Settings", "profile_patterns", fallback=False)
+    GATES.enabled = config.getboolean("Settings", "keyword_gates", fallback=True)
+    PHRASES.load_overrides(config)
+
+
+def worker_settings():
+    # The extraction settings of this process, for init_worker in worker processes
+    return {
+        "verbose": VERBOSE,
+        "tranche_search_max_steps": TRANCHE_SEARCH_MAX_STEPS,
+        "tranche_search_max_seconds": TRANCHE_SEARCH_MAX_SECONDS,
+        "html_parser": HTML_PARSER,
+        "patterns": {
+            name: pattern.pattern
+            for name, pattern in PATTERNS.patterns.items()
+            if pattern.overridden
+        },
+        "profile_patterns": PATTERNS.profile,
+        "keyword_gates": GATES.enabled,
+        "phrases": PHRASES.overrides(),
+    }
+
+
+def init_worker(settings):
+    # Process pool initializer: worker processes start from a fresh import when they
+    # are spawned rather than forked, so the settings are applied again
+    global VERBOSE, TRANCHE_SEARCH_MAX_STEPS, TRANCHE_SEARCH_MAX_SECONDS, HTML_PARSER
+    VERBOSE = settings["verbose"]
+    TRANCHE_SEARCH_MAX_STEPS = settings["tranche_search_max_steps"]
+    TRANCHE_SEARCH_MAX_SECONDS = settings["tranche_search_max_seconds"]
+    HTML_PARSER = settings["html_parser"]
+    for name, pattern in settings["patterns"].items():
+        PATTERNS.override(name, pattern)
+    PATTERNS.profile = settings["profile_patterns"]
+    GATES.enabled = settings["keyword_gates"]
+    if settings["phrases"]:
+        PHRASES.override(settings["phrases"])
@@ -0,0 +1,597 @@
+# Fetching of the directory and deal pages: HTTP with a per-host rate limit, a pool
+# of headless Chrome instances for pages that need JavaScript, and an on-disk page
+# cache. Selenium is only imported once Chrome is first needed.
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice, repeat
+from urllib.parse import urlparse
+
+import os
+import re
+import json
+import time
+import queue
+import hashlib
+import threading
+import requests
+
+from .metrics import RunMetrics
+
+
+# Resources Chrome never needs to download to render the deal content
+BLOCKED_URL_PATTERNS = [
+    # Images
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+    "*.ico",
+    # Stylesheets and fonts
+    "*.css",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.eot",
+    # Third-party scripts (analytics, ads, social widgets)
+    "*googletagmanager.com*",
+    "*google-analytics.com*",
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*facebook.net*",
+    "*platform.twitter.com*",
+    "*platform.linkedin.com*",
+    "*addthis.com*",
+    "*hotjar.com*",
+    "*quantserve.com*",
+    "*scorecardresearch.com*",
+]
+
+
+# Configure Chrome options for headless browsing (only used as a fallback for
+# pages that cannot be read over plain HTTP)
+def create_chrome_driver(page_load_strategy="eager"):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    # Return control once the DOM is ready instead of waiting for every sub-resource
+    chrome_options.page_load_strategy = page_load_strategy
+    chrome_options.add_experimental_option(
+        "prefs",
+        {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.stylesheets": 2,
+            "profile.managed_default_content_settings.fonts": 2,
+        },
+    )
+    driver = webdriver.Chrome(options=chrome_options)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    return driver
+
+
+# Markers that must be present in the raw HTML for a page to be parsed without JavaScript,
+# and the matching CSS selectors Chrome waits for before the page is read
+DIRECTORY_MARKERS = [re.compile(r"id=[\"']?table-deal", re.IGNORECASE)]
+DIRECTORY_SELECTORS = ["#table-deal"]
+DEAL_PAGE_MARKERS = [
+    re.compile(r"id=[\"']?info-box", re.IGNORECASE),
+    re.compile(r"class=[\"'][^\"']*\bpf-content", re.IGNORECASE),
+]
+DEAL_PAGE_SELECTORS = ["div.pf-content", "#info-box"]
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="...; charset=...">
+META_CHARSET = re.compile(
+    rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.IGNORECASE
+)
+
+
+def decode_page(response):
+    # The text of a page. requests decodes text/* as ISO-8859-1 when the Content-Type
+    # has no charset (as python -m http.server sends it), which garbles UTF-8 pages
+    # (" – at a glance"). Without a charset in the header, the page's own <meta
+    # charset> is used, then UTF-8 if the bytes are valid UTF-8, then the encoding
+    # the bytes look like.
+    content = response.content
+    if "charset=" in response.headers.get("Content-Type", "").lower():
+        encodings = [response.encoding]
+    else:
+        found = META_CHARSET.search(content[:4096])
+        encodings = [found.group(1).decode("ascii")] if found else []
+        encodings.append("utf-8")
+    for encoding in encodings:
+        try:
+            return content.decode(encoding)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return content.decode(response.apparent_encoding or "utf-8", errors="replace")
+
+
+class PooledDriver:
+    # One warm Chrome instance (single reused tab) plus its timing counters
+    def __init__(self, slot):
+        self.slot = slot
+        self.driver = None
+        self.pages = 0  # pages loaded by the current Chrome process
+        self.total_pages = 0
+        self.restarts = 0
+        self.wait_timeouts = 0
+        self.startup_time = 0.0
+        self.navigation_time = 0.0  # driver.get until DOM ready
+        self.wait_time = 0.0  # DOM ready until the selectors are present
+        self.read_time = 0.0  # page_source serialisation
+
+    def stats(self):
+        pages = self.total_pages or 1
+        return {
+            "driver": self.slot,
+            "pages": self.total_pages,
+            "restarts": self.restarts,
+            "wait_timeouts": self.wait_timeouts,
+            "startup_s": round(self.startup_time, 3),
+            "navigation_s": round(self.navigation_time, 3),
+            "wait_s": round(self.wait_time, 3),
+            "read_s": round(self.read_time, 3),
+            "avg_page_s": round(
+                (self.navigation_time + self.wait_time + self.read_time) / pages, 3
+            ),
+        }
+
+
+class ChromeDriverPool:
+    # Keeps up to `size` headless Chrome instances warm across pages and recycles each
+    # one after `max_pages_per_driver` loads to cap Chrome's memory growth
+    def __init__(
+        self,
+        size=2,
+        max_pages_per_driver=50,
+        page_load_strategy="eager",
+        wait_timeout=20,
+        driver_factory=create_chrome_driver,
+    ):
+        self.size = max(1, size)
+        self.max_pages_per_driver = max_pages_per_driver
+        self.page_load_strategy = page_load_strategy
+        self.wait_timeout = wait_timeout
+        self.driver_factory = driver_factory
+        self.slots = [PooledDriver(slot) for slot in range(self.size)]
+        self.idle = queue.Queue()
+        for pooled in self.slots:
+            self.idle.put(pooled)
+
+    def start(self, pooled):
+        started = time.perf_counter()
+        pooled.driver = self.driver_factory(self.page_load_strategy)
+        pooled.startup_time += time.perf_counter() - started
+        pooled.pages = 0
+
+    def retire(self, pooled):
+        from selenium.common.exceptions import WebDriverException
+
+        if pooled.driver is not None:
+            try:
+                pooled.driver.quit()
+            except WebDriverException:
+                pass
+            pooled.driver = None
+            pooled.restarts += 1
+
+    def fetch(self, url, selectors=DEAL_PAGE_SELECTORS):
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        pooled = self.idle.get()
+        try:
+            if pooled.driver is None:
+                self.start(pooled)
+            started = time.perf_counter()
+            pooled.driver.get(url)
+            loaded = time.perf_counter()
+            try:
+                WebDriverWait(pooled.driver, self.wait_timeout).until(
+                    EC.all_of(
+                        *(
+                            EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+                            for selector in selectors
+                        )
+                    )
+                )
+            except TimeoutException:
+                # Read whatever rendered; the parser already copes with missing sections
+                pooled.wait_timeouts += 1
+            ready = time.perf_counter()
+            page_source = pooled.driver.page_source
+            pooled.navigation_time += loaded - started
+            pooled.wait_time += ready - loaded
+            pooled.read_time += time.perf_counter() - ready
+            pooled.pages += 1
+            pooled.total_pages += 1
+            if pooled.pages >= self.max_pages_per_driver:
+                self.retire(pooled)
+            return page_source
+        except WebDriverException:
+            # A crashed or wedged Chrome is replaced on the next fetch
+            self.retire(pooled)
+            raise
+        finally:
+            self.idle.put(pooled)
+
+    def stats(self):
+        return [pooled.stats() for pooled in self.slots if pooled.total_pages]
+
+    def close(self):
+        for pooled in self.slots:
+            if pooled.driver is not None:
+                pooled.driver.quit()
+                pooled.driver = None
+
+
+class HostRateLimiter:
+    # Spaces out request start times so that no host receives more than `rate` requests per second
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class DealPageCache:
+    # Content-addressed on-disk cache of raw page HTML. Bodies are stored once under
+    # objects/<sha256 of html>, and every URL gets a small JSON entry under
+    # entries/<sha256 of url> with its ETag / Last-Modified validators. Closed deals are
+    # treated as immutable, open deals (and the directory) expire after `open_ttl`
+    # seconds, and the least recently used entries are evicted above `max_bytes`.
+    def __init__(self, directory, open_ttl=6 * 3600, max_bytes=500 * 1024**2):
+        self.objects_dir = os.path.join(directory, "objects")
+        self.entries_dir = os.path.join(directory, "entries")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.entries_dir, exist_ok=True)
+        self.open_ttl = open_ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = sum(
+            entry.stat().st_size for entry in os.scandir(self.objects_dir)
+        )
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def entry_path(self, url):
+        return os.path.join(self.entries_dir, self.digest(url.encode("utf-8")) + ".json")
+
+    def object_path(self, content):
+        return os.path.join(self.objects_dir, content + ".html")
+
+    @staticmethod
+    def write_atomic(path, data):
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def lookup(self, url):
+        try:
+            with open(self.entry_path(url), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self.object_path(entry["content"])):
+            return None
+        return entry
+
+    def is_fresh(self, entry, closed):
+        if closed:
+            return True
+        return time.time() - entry["fetched_at"] < self.open_ttl
+
+    def read(self, entry):
+        # The cached page of an entry, or None when it was evicted or stored again
+        # since the lookup. The body is read and the entry rewritten under the lock, so
+        # eviction cannot remove one between the two and an entry is never written
+        # back without its body.
+        entry_path = self.entry_path(entry["url"])
+        with self.lock:
+            try:
+                with open(entry_path, encoding="utf-8") as f:
+                    current = json.load(f)
+            except (OSError, ValueError):
+                return None
+            if current["content"] != entry["content"]:
+                return None
+            try:
+                with open(self.object_path(entry["content"]), encoding="utf-8") as f:
+                    page_source = f.read()
+            except OSError:
+                os.remove(entry_path)
+                return None
+            entry["last_access"] = time.time()
+            self.write_atomic(entry_path, json.dumps(entry).encode("utf-8"))
+        return page_source
+
+    def store(self, url, page_source, etag=None, last_modified=None, closed=False):
+        data = page_source.encode("utf-8")
+        content = self.digest(data)
+        now = time.time()
+        entry = {
+            "url": url,
+            "content": content,
+            "size": len(data),
+            "etag": etag,
+            "last_modified": last_modified,
+            "closed": bool(closed),
+            "fetched_at": now,
+            "last_access": now,
+        }
+        with self.lock:
+            object_path = self.object_path(content)
+            if not os.path.exists(object_path):
+                self.write_atomic(object_path, data)
+                self.total_bytes += len(data)
+            self.write_atomic(self.entry_path(url), json.dumps(entry).encode("utf-8"))
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        # Delete the bodies no entry points to any more (the old content of a URL that
+        # was stored again), then drop least recently used entries until the stored
+        # bodies fit in max_bytes; a body is only deleted once no remaining entry
+        # points to it
+        entries = []
+        references = {}
+        for item in os.scandir(self.entries_dir):
+            try:
+                with open(item.path, encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            entries.append((entry["last_access"], item.path, entry))
+            references[entry["content"]] = references.get(entry["content"], 0) + 1
+        for item in os.scandir(self.objects_dir):
+            content, extension = os.path.splitext(item.name)
+            if extension == ".html" and content not in references:
+                self.total_bytes -= item.stat().st_size
+                os.remove(item.path)
+        entries.sort(key=lambda x: x[0])
+        for _, path, entry in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            os.remove(path)
+            self.evictions += 1
+            references[entry["content"]] -= 1
+            if references[entry["content"]] == 0:
+                object_path = self.object_path(entry["content"])
+                if os.path.exists(object_path):
+                    self.total_bytes -= os.path.getsize(object_path)
+                    os.remove(object_path)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size_mb": round(self.total_bytes / 1024**2, 1),
+        }
+
+
+class DealPageFetcher:
+    # Fetches pages over HTTP with one keep-alive session per worker thread and falls
+    # back to a (lazily started) headless Chrome when the page needs JavaScript.
+    # With a cache, fresh pages are served from disk and stale ones are revalidated.
+    def __init__(
+        self,
+        mode="http",
+        max_workers=8,
+        requests_per_second=4.0,
+        timeout=30,
+        browser_pool=None,
+        cache=None,
+        cache_only=False,
+        metrics=None,
+    ):
+        self.mode = mode
+        self.browser_pool = browser_pool or ChromeDriverPool()
+        self.max_workers = (
+            max(1, max_workers) if mode == "http" else self.browser_pool.size
+        )
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.timeout = timeout
+        self.local = threading.local()
+        self.sessions = []  # Every thread's session, closed with the fetcher
+        self.cache = cache
+        self.cache_only = cache_only
+        self.metrics = metrics or RunMetrics()
+
+    def session(self):
+        if not hasattr(self.local, "session"):
+            session = requests.Session()
+            session.headers.update(
+                {"User-Agent": "Mozilla/5.0 (compatible; artemis-scraper)"}
+            )
+            self.local.session = session
+            self.sessions.append(session)
+        return self.local.session
+
+    def fetch_http(self, url, entry=None):
+        # Returns the page and its cache validators, sending a conditional request
+        # when a (stale) cached copy is available
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        with self.metrics.timer("rate_limit_wait"):
+            self.rate_limiter.wait(url)
+        response = self.session().get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and entry is not None:
+            page_source = self.cache.read(entry)
+            if page_source is None:
+                # Evicted since the lookup, so the page is requested in full
+                return self.fetch_http(url)
+            self.cache.revalidated += 1
+            return page_source, entry.get("etag"), entry.get("last_modified")
+        response.raise_for_status()
+        return (
+            decode_page(response),
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+
+    def fetch_browser(self, url, selectors=DEAL_PAGE_SELECTORS):
+        with self.metrics.timer("rate_limit_wait"):
+            self.rate_limiter.wait(url)
+        return self.browser_pool.fetch(url, selectors)
+
+    def fetch(
+        self,
+        url,
+        markers=DEAL_PAGE_MARKERS,
+        selectors=DEAL_PAGE_SELECTORS,
+        closed=False,
+    ):
+        started = time.perf_counter()
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry is not None and (self.cache_only or self.cache.is_fresh(entry, closed)):
+            page_source = self.cache.read(entry)
+            if page_source is not None:
+                self.cache.hits += 1
+                self.metrics.record_fetch(url, "cache", time.perf_counter() - started)
+                return page_source
+            entry = None
+        if self.cache_only:
+            raise LookupError(f"{url} is not in the page cache")
+        if self.cache:
+            self.cache.misses += 1
+
+        etag = last_modified = None
+        source = "browser"
+        if self.mode == "selenium":
+            page_source = self.fetch_browser(url, selectors)
+        else:
+            source = "http"
+            try:
+                page_source, etag, last_modified = self.fetch_http(url, entry)
+            except requests.RequestException as e:
+                print(f"HTTP fetch failed for {url} ({e}), retrying with Chrome")
+                page_source = None
+            if page_source is None or not all(
+                marker.search(page_source) for marker in markers
+            ):
+                # The static HTML is missing content that is rendered client-side
+                self.metrics.count("http_fallbacks_to_browser")
+                page_source = self.fetch_browser(url, selectors)
+                etag = last_modified = None
+                source = "browser"
+
+        if self.cache:
+            self.cache.store(url, page_source, etag, last_modified, closed)
+        self.metrics.record_fetch(url, source, time.perf_counter() - started)
+        return page_source
+
+    def fetch_in_order(
+        self,
+        urls,
+        markers=DEAL_PAGE_MARKERS,
+        selectors=DEAL_PAGE_SELECTORS,
+        closed_flags=None,
+    ):
+        # Yields (url, page_source, error) in the same order as `urls`, keeping at most
+        # 2 * max_workers requests in flight so an early stop wastes little work
+        jobs = zip(urls, closed_flags if closed_flags is not None else repeat(False))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque(
+                (url, executor.submit(self.fetch, url, markers, selectors, closed))
+                for url, closed in islice(jobs, self.max_workers * 2)
+            )
+            try:
+                while pending:
+                    url, future = pending.popleft()
+                    for next_url, closed in islice(jobs, 1):
+                        pending.append(
+                            (
+                                next_url,
+                                executor.submit(
+                                    self.fetch, next_url, markers, selectors, closed
+                                ),
+                            )
+                        )
+                    try:
+                        yield url, future.result(), None
+                    except Exception as e:
+                        yield url, None, e
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def close(self):
+        for stats in self.browser_pool.stats():
+            print("Chrome driver timings:", stats)
+        if self.cache:
+            print("Page cache:", self.cache.stats())
+        for session in self.sessions:
+            session.close()
+        self.sessions.clear()
+        self.browser_pool.close()
+
+
+# Artemis deal directory (can be pointed to a local mirror in config.ini)
+DIRECTORY_URL = "https://www.artemis.bm/deal-directory/"
+
+
+def fetcher_from_config(config, metrics=None):
+    # A DealPageFetcher set up from the [Settings] of config.ini
+    return DealPageFetcher(
+        mode=config.get("Settings", "fetch_mode", fallback="http"),
+        max_workers=config.getint("Settings", "max_workers", fallback=8),
+        requests_per_second=config.getfloat(
+            "Settings", "requests_per_host_per_second", fallback=4.0
+        ),
+        timeout=config.getfloat("Settings", "request_timeout", fallback=30),
+        browser_pool=ChromeDriverPool(
+            size=config.getint("Settings", "browser_pool_size", fallback=2),
+            max_pages_per_driver=config.getint(
+                "Settings", "browser_pages_per_driver", fallback=50
+            ),
+            page_load_strategy=config.get(
+                "Settings", "browser_page_load_strategy", fallback="eager"
+            ),
+            wait_timeout=config.getfloat(
+                "Settings", "browser_wait_timeout", fallback=20
+            ),
+        ),
+        cache=(
+            DealPageCache(
+                config.get("Settings", "cache_directory"),
+                open_ttl=config.getfloat("Settings", "cache_open_ttl_hours", fallback=6)
+                * 3600,
+                max_bytes=config.getfloat("Settings", "cache_max_mb", fallback=500)
+                * 1024**2,
+            )
+            if config.get("Settings", "cache_directory", fallback="")
+            else None
+        ),
+        cache_only=config.getboolean("Settings", "cache_only", fallback=False),
+        metrics=metrics,
+    )
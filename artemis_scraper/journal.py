@@ -0,0 +1,106 @@
+# Append-only journal of the deals a scrape has finished. Each deal is written as one
+# JSON line (link, status, rows) and synced to disk as soon as it is parsed, so a run
+# that is interrupted can be resumed without fetching those deals again. The store /
+# workbook is written from the journal at the end of the run, and the journal is then
+# removed. A new run never truncates a journal left by an interrupted one: it is kept
+# under a new name.
+
+from collections import OrderedDict
+
+import os
+import json
+import datetime
+
+from .store import DealStore
+
+OK = "ok"  # Parsed; the rows are in the record
+ERROR = "error"  # Fetching or parsing failed; retried by a resumed run
+STOP = "stop"  # The last closed deal of the workbook was reached
+
+
+def read_journal(path):
+    # Records of a journal by link (the last one wins). A line cut short by a crash
+    # is ignored.
+    records = OrderedDict()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records.pop(record["link"], None)
+            records[record["link"]] = record
+    return records
+
+
+class DealJournal:
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.records = OrderedDict()
+        if resume and os.path.exists(path):
+            self.records = read_journal(path)
+        elif os.path.exists(path) and os.path.getsize(path):
+            # A new run starts a new journal; the deals of the interrupted run are kept
+            # and can be resumed from the renamed file
+            kept_path = self.rotated_path(path)
+            os.replace(path, kept_path)
+            print(f"Journal of an unfinished run kept as {kept_path}")
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    @staticmethod
+    def rotated_path(path):
+        root, extension = os.path.splitext(path)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        rotated = f"{root}.{stamp}{extension}"
+        number = 1
+        while os.path.exists(rotated):
+            number += 1
+            rotated = f"{root}.{stamp}-{number}{extension}"
+        return rotated
+
+    def completed(self):
+        # Links a resumed run does not need to fetch again
+        return {link for link, record in self.records.items() if record["status"] == OK}
+
+    def stopped(self):
+        return any(record["status"] == STOP for record in self.records.values())
+
+    def append(self, link, deal_closed, Deal_name, rows=None, status=OK, error=None):
+        record = {
+            "link": link,
+            "deal_closed": deal_closed,
+            "deal": Deal_name,
+            "status": status,
+            "error": error,
+            "rows": [DealStore.to_db(row_data) for row_data in rows or []],
+        }
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.records.pop(link, None)
+        self.records[link] = record
+
+    def materialise(self, links):
+        # Rows and (link, deal_closed) of the parsed deals, in the order of `links`
+        # (the fetch plan) followed by any other journaled deals
+        order = {link: index for index, link in enumerate(links)}
+        records = sorted(
+            (record for record in self.records.values() if record["status"] == OK),
+            key=lambda record: order.get(record["link"], len(order)),
+        )
+        rows = []
+        fetched_links = []
+        for record in records:
+            rows.extend(DealStore.from_db(row_data) for row_data in record["rows"])
+            fetched_links.append((record["link"], record["deal_closed"]))
+        return rows, fetched_links
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def remove(self):
+        # Called once the store / workbook has been written from the journal
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
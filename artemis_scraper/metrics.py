@@ -0,0 +1,207 @@
+# Stage timers, counters and the per-deal trace of a run
+
+from collections import OrderedDict
+
+import os
+import json
+import time
+import datetime
+import threading
+import contextlib
+
+from .columns import headers
+
+# Values of an extracted column that mean the extraction found nothing, for rows
+# without the per-column results of the typed records in their trace
+MISSING_VALUES = (
+    "NA",
+    "None",
+    "Unknown",
+    "Not determined",
+    "Size not determined",
+    "Not issued",
+    "Not Issued",
+    "Invalid issue date",
+    None,
+)
+EXTRACTED_COLUMNS = [
+    "Size",
+    "Maturity",
+    "Attachment Probability",
+    "Attachment Point",
+    "Expected Loss",
+    "Spread",
+    "Risk Multiple",
+]
+
+
+def marker_results(row_data):
+    # Hit / missing / error of the extracted columns of a row, from its markers
+    results = {}
+    for column in EXTRACTED_COLUMNS:
+        value = row_data[headers.index(column)]
+        if value == "ERROR":
+            results[column] = "error"
+        elif value in MISSING_VALUES:
+            results[column] = "missing"
+        else:
+            results[column] = "hit"
+    return results
+
+
+class RunMetrics:
+    # Stage timers and counters for one run, a per-deal trace and an end-of-run
+    # summary. Timers can be used from any thread; parser processes send their
+    # timings back in each deal's trace record, so parse stages add up CPU time
+    # across workers.
+    def __init__(self, trace_path=""):
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.stages = OrderedDict()  # stage -> [calls, seconds]
+        self.counters = OrderedDict()
+        self.extraction = OrderedDict(
+            (column, {"hit": 0, "missing": 0, "error": 0})
+            for column in EXTRACTED_COLUMNS
+        )
+        self.patterns = {}  # pattern -> [calls, hits, seconds] from the traces
+        self.fetches = {}  # url -> (source, seconds), until the deal is traced
+        self.trace_file = None
+        if trace_path:
+            self.trace_file = open(trace_path, "a", encoding="utf-8")
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - started)
+
+    def add_time(self, stage, seconds, calls=1):
+        with self.lock:
+            entry = self.stages.setdefault(stage, [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_fetch(self, url, source, seconds):
+        self.add_time(f"fetch_{source}", seconds)
+        self.count(f"pages_from_{source}")
+        with self.lock:
+            self.fetches[url] = (source, seconds)
+
+    def record_deal(self, link, Deal_name, deal_rows, trace, error):
+        source, fetch_seconds = self.fetches.pop(link, (None, None))
+        record = {
+            "link": link,
+            "deal": Deal_name,
+            "fetched_from": source,
+            "fetch_seconds": fetch_seconds,
+            "rows": len(deal_rows) if deal_rows else 0,
+            "error": error,
+        }
+        for stage, seconds in (trace or {}).get("seconds", {}).items():
+            self.add_time(stage, seconds)
+            record[f"{stage}_seconds"] = seconds
+        for name, amount in (trace or {}).get("gates", {}).items():
+            if name == "calls_avoided":
+                self.count("regex_calls_avoided", amount)
+            else:
+                self.count(f"gated_{name}", amount)
+        for name, counts in (trace or {}).get("patterns", {}).items():
+            with self.lock:
+                totals = self.patterns.setdefault(name, [0, 0, 0.0])
+                for index, amount in enumerate(counts):
+                    totals[index] += amount
+        if trace and trace.get("tranche_status"):
+            record["tranche_status"] = trace["tranche_status"]
+            self.count(f"tranche_{trace['tranche_status']}")
+        if error is not None:
+            self.count("fetch_errors" if trace is None else "parse_errors")
+        else:
+            self.count("deals_parsed")
+            self.count("rows", len(deal_rows))
+            missing = {}
+            row_results = (trace or {}).get("extraction")
+            if row_results is None:
+                row_results = [marker_results(row_data) for row_data in deal_rows]
+            for results in row_results:
+                for column, result in results.items():
+                    self.extraction[column][result] += 1
+                    if result == "missing":
+                        missing[column] = missing.get(column, 0) + 1
+            record["missing"] = missing
+        if self.trace_file is not None:
+            self.trace_file.write(json.dumps(record, default=str) + "\n")
+
+    def snapshot(self):
+        return {
+            "started": datetime.datetime.fromtimestamp(self.started).isoformat(),
+            "duration_seconds": time.time() - self.started,
+            "stages": {
+                stage: {"calls": calls, "seconds": seconds}
+                for stage, (calls, seconds) in self.stages.items()
+            },
+            "counters": dict(self.counters),
+            "extraction": self.extraction,
+        }
+
+    def print_summary(self):
+        print(f"Run finished in {time.time() - self.started:.1f}s")
+        print(f"{'Stage':<28}{'Calls':>8}{'Total s':>10}{'Mean ms':>10}")
+        for stage, (calls, seconds) in self.stages.items():
+            mean = 1000 * seconds / calls if calls else 0
+            print(f"{stage:<28}{calls:>8}{seconds:>10.2f}{mean:>10.1f}")
+        for name, value in self.counters.items():
+            print(f"{name:<28}{value:>8}")
+        print(f"{'Column':<28}{'Hit':>8}{'Missing':>10}{'Error':>10}{'Hit rate':>10}")
+        for column, results in self.extraction.items():
+            total = sum(results.values())
+            if not total:
+                continue
+            print(
+                f"{column:<28}{results['hit']:>8}{results['missing']:>10}"
+                f"{results['error']:>10}{results['hit'] / total:>10.0%}"
+            )
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def write_prometheus(self, path):
+        # Prometheus text format, e.g. for the node exporter's textfile collector;
+        # written next to the target and renamed so it is never read half-written
+        prefix = "artemis_scraper"
+        lines = [
+            f"# TYPE {prefix}_run_timestamp_seconds gauge",
+            f"{prefix}_run_timestamp_seconds {self.started:.0f}",
+            f"# TYPE {prefix}_run_duration_seconds gauge",
+            f"{prefix}_run_duration_seconds {time.time() - self.started:.3f}",
+            f"# TYPE {prefix}_stage_seconds gauge",
+        ]
+        for stage, (calls, seconds) in self.stages.items():
+            lines.append(f'{prefix}_stage_seconds{{stage="{stage}"}} {seconds:.6f}')
+        lines.append(f"# TYPE {prefix}_stage_calls gauge")
+        for stage, (calls, seconds) in self.stages.items():
+            lines.append(f'{prefix}_stage_calls{{stage="{stage}"}} {calls}')
+        lines.append(f"# TYPE {prefix}_events gauge")
+        for name, value in self.counters.items():
+            lines.append(f'{prefix}_events{{event="{name}"}} {value}')
+        lines.append(f"# TYPE {prefix}_extracted_values gauge")
+        for column, results in self.extraction.items():
+            for result, value in results.items():
+                lines.append(
+                    f'{prefix}_extracted_values{{column="{column}",result="{result}"}}'
+                    f" {value}"
+                )
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, path)
+
+    def close(self):
+        if self.trace_file is not None:
+            self.trace_file.close()
@@ -0,0 +1,201 @@
+# Named, compiled regex patterns shared by the extraction functions
+
+from collections import OrderedDict
+
+import re
+import time
+
+
+class RegisteredPattern:
+    # A named extraction pattern, compiled once, with optional profiling counters
+    def __init__(self, registry, name, pattern, flags=0):
+        self.registry = registry
+        self.name = name
+        self.flags = flags
+        self.default = pattern
+        self.compile(pattern)
+        self.calls = 0
+        self.hits = 0
+        self.seconds = 0.0
+
+    def compile(self, pattern):
+        self.pattern = pattern
+        self.compiled = re.compile(pattern, self.flags)
+
+    @property
+    def overridden(self):
+        return self.pattern != self.default
+
+    def record(self, started, hits):
+        self.seconds += time.perf_counter() - started
+        self.calls += 1
+        self.hits += hits
+
+    def search(self, string, *args):
+        if not self.registry.profile:
+            return self.compiled.search(string, *args)
+        started = time.perf_counter()
+        match = self.compiled.search(string, *args)
+        self.record(started, match is not None)
+        return match
+
+    def match(self, string, *args):
+        if not self.registry.profile:
+            return self.compiled.match(string, *args)
+        started = time.perf_counter()
+        match = self.compiled.match(string, *args)
+        self.record(started, match is not None)
+        return match
+
+    def finditer(self, string, *args):
+        if not self.registry.profile:
+            return self.compiled.finditer(string, *args)
+        started = time.perf_counter()
+        matches = list(self.compiled.finditer(string, *args))
+        self.record(started, len(matches))
+        return iter(matches)
+
+    def findall(self, string, *args):
+        if not self.registry.profile:
+            return self.compiled.findall(string, *args)
+        started = time.perf_counter()
+        matches = self.compiled.findall(string, *args)
+        self.record(started, len(matches))
+        return matches
+
+
+class PatternRegistry:
+    # Central registry of the named regex patterns used by the parse_* functions.
+    # Any pattern can be replaced from the [Patterns] section of config.ini, and with
+    # profiling on each pattern counts its calls, hits and the time spent in it.
+    def __init__(self):
+        self.patterns = OrderedDict()
+        self.profile = False
+
+    def register(self, name, pattern, flags=0):
+        registered = RegisteredPattern(self, name, pattern, flags)
+        self.patterns[name] = registered
+        return registered
+
+    def __getitem__(self, name):
+        return self.patterns[name]
+
+    def names(self):
+        return list(self.patterns)
+
+    def override(self, name, pattern):
+        self.patterns[name].compile(pattern)
+
+    def load_overrides(self, config, section="Patterns"):
+        if section not in config:
+            return
+        for name in config[section]:
+            if name not in self.patterns:
+                print(f"Unknown pattern '{name}' in [{section}], ignoring it")
+                continue
+            # raw=True so that "%" in a regex is not treated as interpolation
+            self.override(name, config.get(section, name, raw=True))
+            print(f"Pattern '{name}' overridden from config")
+
+    def counts(self):
+        # Running [calls, hits, seconds] of the patterns that were called, for the
+        # difference before and after a deal is parsed
+        return {
+            p.name: [p.calls, p.hits, p.seconds]
+            for p in self.patterns.values()
+            if p.calls
+        }
+
+    def report(self, totals=None):
+        # Counters of this process, or `totals` ([calls, hits, seconds] by pattern)
+        # added up from the traces of parser processes
+        if totals is None:
+            totals = self.counts()
+        rows = []
+        for p in self.patterns.values():
+            calls, hits, seconds = totals.get(p.name, (0, 0, 0.0))
+            rows.append(
+                {
+                    "pattern": p.name,
+                    "calls": calls,
+                    "hits": hits,
+                    "seconds": round(seconds, 4),
+                    "overridden": p.overridden,
+                }
+            )
+        return sorted(rows, key=lambda row: row["seconds"], reverse=True)
+
+    def print_report(self, totals=None):
+        print(f"{'Pattern':<28}{'Calls':>10}{'Hits':>10}{'Seconds':>12}")
+        for row in self.report(totals):
+            if row["calls"]:
+                print(
+                    f"{row['pattern']:<28}{row['calls']:>10}{row['hits']:>10}"
+                    f"{row['seconds']:>12.4f}"
+                )
+
+
+class KeywordGates:
+    # Cheap keyword gates in front of the patterns: a family of patterns can only
+    # match a text that contains one keyword of each of its keyword groups, so one
+    # scan of the lower-cased text decides which families are worth trying. The scan
+    # of the last text is kept, as the parse_* functions run one after the other on
+    # the same description or tranche text. A family whose patterns were overridden
+    # from config is never skipped. Counts the texts skipped per family and the
+    # pattern calls that saved.
+    def __init__(self, registry):
+        self.registry = registry
+        self.families = OrderedDict()  # family -> (keyword groups, pattern names)
+        self.enabled = True
+        self.last_text = None
+        self.last_viable = frozenset()
+        self.skipped = OrderedDict()
+        self.calls_avoided = 0
+
+    def register(self, family, keyword_groups, pattern_names):
+        self.families[family] = (
+            [tuple(keyword.lower() for keyword in group) for group in keyword_groups],
+            list(pattern_names),
+        )
+        self.skipped[family] = 0
+
+    def viable(self, text):
+        # Families whose keywords are all in `text`
+        if text is not self.last_text:
+            lowered = text.lower()
+            self.last_viable = frozenset(
+                family
+                for family, (keyword_groups, _) in self.families.items()
+                if all(
+                    any(keyword in lowered for keyword in group)
+                    for group in keyword_groups
+                )
+            )
+            self.last_text = text
+        return self.last_viable
+
+    def allows(self, family, text):
+        if not self.enabled or family in self.viable(text):
+            return True
+        pattern_names = self.families[family][1]
+        if any(self.registry[name].overridden for name in pattern_names):
+            return True
+        self.skipped[family] += 1
+        self.calls_avoided += len(pattern_names)
+        return False
+
+    def counts(self):
+        # Running totals, for the difference before and after a deal is parsed
+        counts = OrderedDict(self.skipped)
+        counts["calls_avoided"] = self.calls_avoided
+        return counts
+
+    def print_report(self):
+        print(f"{'Gate':<28}{'Texts skipped':>14}")
+        for family, skipped in self.skipped.items():
+            print(f"{family:<28}{skipped:>14}")
+        print(f"Pattern calls avoided: {self.calls_avoided}")
+
+
+PATTERNS = PatternRegistry()
+GATES = KeywordGates(PATTERNS)
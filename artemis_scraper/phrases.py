@@ -0,0 +1,176 @@
+# Phrase classifier: one Aho-Corasick pass over a lower-cased text finds every phrase
+# (as whole words) of a dictionary of tags, e.g. the tranche status ("status.not_issued"), the issuer
+# type ("issuer.ibrd") or the peril categories ("peril.wind") of a text. Tags are
+# named "<kind>.<name>"; the phrases of any tag can be replaced, and tags added, from
+# the [Phrases] section of config.ini.
+
+from collections import OrderedDict, deque
+
+# Default dictionary: tag -> phrases (matched in lower case as whole words, or their
+# plurals)
+DEFAULT_PHRASES = OrderedDict(
+    [
+        (
+            "status.not_issued",
+            (
+                "not issued",
+                "not placed",
+                "won't be issued",
+                "no longer be issued",
+                "will not now be placed",
+            ),
+        ),
+        ("status.pulled", ("pulled from issuance",)),
+        (
+            "issuer.ibrd",
+            (
+                "ibrd",
+                "international bank for reconstruction and development",
+                "world bank",
+            ),
+        ),
+        ("structure.multiple_tranches", ("tranches",)),
+        (
+            "peril.wind",
+            ("hurricane", "named storm", "tropical", "windstorm", "typhoon", "wind"),
+        ),
+        ("peril.earthquake", ("earthquake", "quake", "seismic")),
+        ("peril.flood", ("flood", "storm surge")),
+        ("peril.wildfire", ("wildfire", "fire")),
+        (
+            "peril.severe_weather",
+            ("severe", "convective", "tornado", "hail", "hailstorm", "winter storm"),
+        ),
+        (
+            "peril.life_and_health",
+            ("mortality", "pandemic", "medical", "health", "longevity"),
+        ),
+    ]
+)
+
+
+def is_word_end(text, end):
+    # Whether a phrase ending before `end` ends a word of the text: nothing or a
+    # non-word character follows, or a plural "s" / "es" does
+    for suffix in ("", "s", "es"):
+        if text.startswith(suffix, end):
+            after = end + len(suffix)
+            if after == len(text) or not text[after].isalnum():
+                return True
+    return False
+
+
+class PhraseMatcher:
+    # Aho-Corasick automaton over lower-cased phrases. The failure links are folded
+    # into a complete transition table for the characters the phrases use, so a scan
+    # is one dictionary lookup per character of the text. A phrase only counts where
+    # it starts and ends on a word boundary, so "wind" is not found in "windfall".
+    def __init__(self, phrases):
+        # phrases: (phrase, value) pairs; a scan returns the values of the phrases found
+        goto = [{}]
+        outputs = [set()]
+        for phrase, value in phrases:
+            node = 0
+            for character in phrase.lower():
+                if character not in goto[node]:
+                    goto.append({})
+                    outputs.append(set())
+                    goto[node][character] = len(goto) - 1
+                node = goto[node][character]
+            outputs[node].add((len(phrase), value))
+
+        alphabet = {character for edges in goto for character in edges}
+        fail = [0] * len(goto)
+        self.table = [dict() for _ in goto]
+        self.table[0] = {character: goto[0].get(character, 0) for character in alphabet}
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            outputs[node] |= outputs[fail[node]]
+            for character in alphabet:
+                child = goto[node].get(character)
+                if child is None:
+                    # Follow the failure link, already resolved for shallower nodes
+                    self.table[node][character] = self.table[fail[node]][character]
+                else:
+                    self.table[node][character] = child
+                    fail[child] = self.table[fail[node]][character]
+                    queue.append(child)
+        self.outputs = [frozenset(values) for values in outputs]
+
+    def scan(self, text):
+        table = self.table
+        outputs = self.outputs
+        text = text.lower()
+        node = 0
+        found = set()
+        for end, character in enumerate(text, start=1):
+            node = table[node].get(character, 0)
+            if outputs[node]:
+                for length, value in outputs[node]:
+                    start = end - length
+                    if value in found:
+                        continue
+                    if start and text[start - 1].isalnum() and text[start].isalnum():
+                        continue
+                    if text[end - 1].isalnum() and not is_word_end(text, end):
+                        continue
+                    found.add(value)
+        return found
+
+
+class PhraseClassifier:
+    # Tags of a text from one scan of the matcher built from the dictionary
+    def __init__(self, dictionary=DEFAULT_PHRASES):
+        self.dictionary = OrderedDict(dictionary)
+        self.default = OrderedDict(dictionary)
+        self.build()
+
+    def build(self):
+        self.matcher = PhraseMatcher(
+            (phrase, tag)
+            for tag, phrases in self.dictionary.items()
+            for phrase in phrases
+        )
+
+    def tags(self, text, kind=None):
+        # Sorted tags found in `text` by one scan, only those of `kind` (e.g. "peril")
+        # if given
+        if not text:
+            return ()
+        found = self.matcher.scan(str(text))
+        if kind is not None:
+            found = {tag for tag in found if tag.startswith(kind + ".")}
+        return tuple(sorted(found))
+
+    def has(self, tag, text):
+        # Whether `text` has a phrase of one tag, from the same scan as tags()
+        return tag in self.tags(text)
+
+    def overrides(self):
+        return OrderedDict(
+            (tag, phrases)
+            for tag, phrases in self.dictionary.items()
+            if self.default.get(tag) != phrases
+        )
+
+    def override(self, overrides):
+        for tag, phrases in overrides.items():
+            self.dictionary[tag] = tuple(phrases)
+        self.build()
+
+    def load_overrides(self, config, section="Phrases"):
+        # tag = phrase, phrase, ... replaces (or adds) the phrases of a tag
+        if section not in config:
+            return
+        overrides = OrderedDict()
+        for tag in config[section]:
+            phrases = config.get(section, tag, raw=True).split(",")
+            overrides[tag] = tuple(
+                phrase.strip().lower() for phrase in phrases if phrase.strip()
+            )
+            print(f"Phrases of '{tag}' set from config")
+        self.override(overrides)
+
+
+PHRASES = PhraseClassifier()
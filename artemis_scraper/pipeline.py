@@ -0,0 +1,196 @@
+# Parse pipeline: fetched pages are parsed in worker processes while the next pages
+# are being fetched, and the parsed deals are handed back in fetch order
+
+from collections import deque
+
+import time
+import queue
+import threading
+import multiprocessing
+
+from .extraction import (
+    read_deal_page,
+    extract_deal_facts,
+    deal_from_facts,
+    worker_settings,
+    init_worker,
+)
+from .patterns import PATTERNS, GATES
+from .records import extraction_results
+
+
+def parse_deal_page(job):
+    # Parser worker: the deal name, rows and stage timings of one fetched page. The
+    # name is returned even when building the rows fails, since the stop check only
+    # needs the name.
+    link, page_source, deal_closed = job
+    trace = {"seconds": {}}
+    Deal_name = None
+    gates_before = GATES.counts()
+    patterns_before = PATTERNS.counts() if PATTERNS.profile else None
+    try:
+        started = time.perf_counter()
+        Deal_name, fact_texts, description = read_deal_page(page_source)
+        if Deal_name is None:
+            Deal_name = "NA"
+        parsed = time.perf_counter()
+        trace["seconds"]["html_parse"] = parsed - started
+        facts = extract_deal_facts(fact_texts)
+        trace["seconds"]["key_facts"] = time.perf_counter() - parsed
+        deal = deal_from_facts(Deal_name, facts, description, link, deal_closed, trace)
+        deal_rows = deal.to_rows()
+        trace["extraction"] = extraction_results(deal)
+        # Texts the keyword gates kept away from each family of patterns
+        trace["gates"] = {
+            name: count - gates_before[name]
+            for name, count in GATES.counts().items()
+            if count != gates_before[name]
+        }
+        # Pattern profiling counters of this deal, added up by the writer
+        if patterns_before is not None:
+            trace["patterns"] = {}
+            for name, counts in PATTERNS.counts().items():
+                before = patterns_before.get(name, (0, 0, 0.0))
+                if counts[0] != before[0]:
+                    trace["patterns"][name] = [
+                        count - previous for count, previous in zip(counts, before)
+                    ]
+        return Deal_name, deal_rows, None, trace
+    except Exception as e:
+        return Deal_name, None, str(e), trace
+
+
+class ParsePipeline:
+    # Fetching, parsing and writing as separate stages. A feeder thread drains the
+    # fetcher into a bounded queue, a pool of parser processes turns the pages into
+    # rows, and the consumer of run() gets the records back in fetch order, so the
+    # browser keeps fetching while pages are parsed. The pool is started when the
+    # pipeline is created, before any fetch thread is started; with one worker, pages
+    # are parsed in the consuming thread.
+    END = object()
+
+    def __init__(self, workers=1, queue_size=32, progress_every=0):
+        self.workers = max(1, workers)
+        self.pages = queue.Queue(maxsize=max(1, queue_size))
+        self.max_pending = self.workers * 2
+        self.progress_every = progress_every
+        self.stop = threading.Event()
+        self.pool = None
+        if self.workers > 1:
+            self.pool = multiprocessing.Pool(
+                self.workers, initializer=init_worker, initargs=(worker_settings(),)
+            )
+        self.started = time.perf_counter()
+        self.fetched = 0
+        self.fetch_seconds = 0.0
+        self.parsed = 0
+        self.parse_seconds = 0.0
+        self.written = 0
+        self.write_wait_seconds = 0.0
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.max_depth = 0
+
+    def put(self, item):
+        # Blocks while the queue is full, unless the consumer stopped
+        while not self.stop.is_set():
+            try:
+                self.pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def feed(self, pages, closed_flags):
+        try:
+            for (link, page_source, error), deal_closed in zip(pages, closed_flags):
+                self.fetched += 1
+                if not self.put((link, page_source, error, deal_closed)):
+                    break
+        finally:
+            self.fetch_seconds = time.perf_counter() - self.started
+            pages.close()
+            self.put(self.END)
+
+    def submit(self, item):
+        link, page_source, error, deal_closed = item
+        if error is not None:
+            return link, deal_closed, None, error
+        job = (link, page_source, deal_closed)
+        if self.pool is not None:
+            result = self.pool.apply_async(parse_deal_page, (job,))
+            return link, deal_closed, result, None
+        return link, deal_closed, parse_deal_page(job), None
+
+    def collect(self, pending):
+        link, deal_closed, result, error = pending
+        if error is not None:
+            return link, deal_closed, None, None, error, None
+        if self.pool is not None:
+            waited = time.perf_counter()
+            result = result.get()
+            self.write_wait_seconds += time.perf_counter() - waited
+        Deal_name, deal_rows, error, trace = result
+        self.parsed += 1
+        self.parse_seconds += sum(trace["seconds"].values())
+        return link, deal_closed, Deal_name, deal_rows, error, trace
+
+    def run(self, pages, closed_flags):
+        # Yields (link, deal_closed, Deal_name, rows, error, trace) in fetch order.
+        # `pages` yields (link, page_source, error) like DealPageFetcher.fetch_in_order.
+        feeder = threading.Thread(
+            target=self.feed, args=(pages, closed_flags), daemon=True
+        )
+        feeder.start()
+        pending = deque()
+        finished = False
+        try:
+            while not finished or pending:
+                # Keep the parsers busy; only block on the queue when nothing is left
+                # to hand to the writer
+                while not finished and len(pending) < self.max_pending:
+                    try:
+                        item = self.pages.get(block=not pending)
+                    except queue.Empty:
+                        break
+                    depth = self.pages.qsize()
+                    self.depth_samples += 1
+                    self.depth_total += depth
+                    self.max_depth = max(self.max_depth, depth + 1)
+                    if item is self.END:
+                        finished = True
+                    else:
+                        pending.append(self.submit(item))
+                if pending:
+                    record = self.collect(pending.popleft())
+                    self.written += 1
+                    if self.progress_every and self.written % self.progress_every == 0:
+                        print("Pipeline progress:", self.stats(len(pending)))
+                    yield record
+        finally:
+            self.stop.set()
+            feeder.join()
+
+    def stats(self, pending=0):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            "fetched": self.fetched,
+            "parsed": self.parsed,
+            "written": self.written,
+            "queue_depth": self.pages.qsize(),
+            "queue_max_depth": self.max_depth,
+            "queue_mean_depth": round(self.depth_total / max(self.depth_samples, 1), 1),
+            "parsing": pending,
+            "fetch_pages_per_second": round(
+                self.fetched / max(self.fetch_seconds or elapsed, 1e-9), 2
+            ),
+            "parse_ms_per_page": round(1000 * self.parse_seconds / max(self.parsed, 1)),
+            "written_pages_per_second": round(self.written / elapsed, 2),
+            "writer_wait_seconds": round(self.write_wait_seconds, 1),
+        }
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+        print("Parse pipeline:", self.stats())
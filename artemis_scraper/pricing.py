@@ -0,0 +1,406 @@
+# Pricing analysis: regressions of spread on expected loss over the stored rows, written
+# to Pricing_Chart.xlsx. The sufficient statistics of every group (all deals, each
+# peril family, trigger type, year and rolling window of years) come out of one
+# matrix product, so all groups are fitted at once; between runs only the groups that
+# contain new or changed rows are refitted.
+
+from collections import OrderedDict
+
+import os
+import json
+import datetime
+
+import numpy as np
+
+from .columns import headers
+from .phrases import PHRASES
+
+PRICING_FILENAME = "Pricing_Chart.xlsx"
+# Author written into the chart workbook; a file by anyone else is never overwritten
+PRICING_CREATOR = "artemis_scraper pricing"
+
+# Columns of the statistics matrix: per row, 1 and the sums needed for OLS of spread
+# on expected loss, then the same in logs (0 for rows that cannot be logged) and the
+# risk multiple
+STATISTICS = [
+    "n",
+    "x",
+    "y",
+    "xx",
+    "xy",
+    "yy",
+    "log_n",
+    "log_x",
+    "log_y",
+    "log_xx",
+    "log_xy",
+    "log_yy",
+    "risk_multiple",
+]
+
+FIT_COLUMNS = [
+    "Grouping",
+    "Group",
+    "Deals",
+    "Slope",
+    "Intercept",
+    "R squared",
+    "Log-log elasticity",
+    "Log-log multiplier",
+    "Log-log R squared",
+    "Average Risk Multiple",
+]
+
+
+def number(value):
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+
+def pricing_data(rows):
+    # Rows with a numeric, positive expected loss and a numeric spread, as arrays
+    el_column = headers.index("Expected Loss")
+    spread_column = headers.index("Spread")
+    date_column = headers.index("Date of issue")
+    keys, years, perils, triggers, ibrd, deals, dates = [], [], [], [], [], [], []
+    expected_loss, spread = [], []
+    for row_data in rows:
+        x = number(row_data[el_column])
+        y = number(row_data[spread_column])
+        if not (x > 0) or np.isnan(y):
+            continue
+        date_of_issue = row_data[date_column]
+        if not isinstance(date_of_issue, datetime.date):
+            date_of_issue = None
+        deals.append(row_data[0])
+        keys.append(f"{row_data[0]}|{row_data[headers.index('Link')]}")
+        dates.append(date_of_issue)
+        years.append(date_of_issue.year if date_of_issue else 0)
+        perils.append(str(row_data[headers.index("Risks / perils covered")] or ""))
+        triggers.append(str(row_data[headers.index("Trigger type")] or "").strip())
+        ibrd.append(row_data[headers.index("IBRD")] == 1)
+        expected_loss.append(x)
+        spread.append(y)
+    return {
+        "keys": keys,
+        "deals": deals,
+        "dates": dates,
+        "year": np.array(years, dtype=np.int64),
+        "perils": perils,
+        "trigger": np.array(triggers, dtype=object),
+        "ibrd": np.array(ibrd, dtype=bool),
+        "expected_loss": np.array(expected_loss),
+        "spread": np.array(spread),
+    }
+
+
+def peril_families(perils):
+    # Families of one perils text (a deal can be in several): the "peril.*" tags of
+    # the phrase classifier, "peril.severe_weather" -> "Severe weather"
+    return [
+        tag.split(".", 1)[1].replace("_", " ").capitalize()
+        for tag in PHRASES.tags(perils, "peril")
+    ]
+
+
+def row_groups(perils, trigger, year, window_years):
+    # Groups one row belongs to, as "grouping:group" keys
+    groups = ["all:All deals"]
+    groups += [f"peril:{family}" for family in peril_families(perils)]
+    if trigger:
+        groups.append(f"trigger:{trigger}")
+    if year:
+        groups.append(f"year:{year}")
+        groups += [
+            f"window:{end - window_years + 1}-{end}"
+            for end in range(year, year + window_years)
+        ]
+    return groups
+
+
+def membership(data, groups):
+    # Boolean matrix (groups x rows) of the rows in each group
+    size = len(data["keys"])
+    # One classifier scan per row
+    row_families = [peril_families(perils) for perils in data["perils"]]
+    family_masks = {}
+    for column, families in enumerate(row_families):
+        for family in families:
+            family_masks.setdefault(family, np.zeros(size, dtype=bool))[column] = True
+    matrix = np.zeros((len(groups), size), dtype=bool)
+    for index, group in enumerate(groups):
+        grouping, _, name = group.partition(":")
+        if grouping == "all":
+            matrix[index] = True
+        elif grouping == "peril":
+            matrix[index] = family_masks.get(name, False)
+        elif grouping == "trigger":
+            matrix[index] = data["trigger"] == name
+        elif grouping == "year":
+            matrix[index] = data["year"] == int(name)
+        elif grouping == "window":
+            first, last = (int(year) for year in name.split("-"))
+            matrix[index] = (data["year"] >= first) & (data["year"] <= last)
+    return matrix
+
+
+def row_statistics(data):
+    # Rows x STATISTICS matrix whose column sums are a group's sufficient statistics
+    x = data["expected_loss"]
+    y = data["spread"]
+    loggable = y > 0  # x > 0 for every row kept
+    log_x = np.where(loggable, np.log(x), 0.0)
+    log_y = np.where(loggable, np.log(np.where(loggable, y, 1.0)), 0.0)
+    return np.column_stack(
+        [
+            np.ones_like(x),
+            x,
+            y,
+            x * x,
+            x * y,
+            y * y,
+            loggable.astype(float),
+            log_x,
+            log_y,
+            log_x * log_x,
+            log_x * log_y,
+            log_y * log_y,
+            y / x,
+        ]
+    )
+
+
+def least_squares(n, sx, sy, sxx, sxy, syy):
+    # Slope, intercept and R squared of y = intercept + slope * x for every group at
+    # once from the sums; NaN where a group has fewer than two distinct x values
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sxx_centered = sxx - sx * sx / n
+        syy_centered = syy - sy * sy / n
+        sxy_centered = sxy - sx * sy / n
+        valid = (n >= 2) & (sxx_centered > 1e-12 * np.maximum(sxx, 1.0))
+        slope = np.where(valid, sxy_centered / sxx_centered, np.nan)
+        intercept = np.where(valid, (sy - slope * sx) / n, np.nan)
+        r_squared = np.where(
+            valid & (syy_centered > 0),
+            sxy_centered * sxy_centered / (sxx_centered * syy_centered),
+            np.nan,
+        )
+    return slope, intercept, r_squared
+
+
+def fit_groups(data, groups):
+    # Fit of every group in `groups`: OLS of spread on expected loss and of log spread
+    # on log expected loss (spread = multiplier * expected loss ** elasticity)
+    if not groups:
+        return {}
+    sums = membership(data, groups).astype(float) @ row_statistics(data)
+    s = {name: sums[:, index] for index, name in enumerate(STATISTICS)}
+    slope, intercept, r_squared = least_squares(
+        s["n"], s["x"], s["y"], s["xx"], s["xy"], s["yy"]
+    )
+    elasticity, log_intercept, log_r_squared = least_squares(
+        s["log_n"], s["log_x"], s["log_y"], s["log_xx"], s["log_xy"], s["log_yy"]
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average_multiple = s["risk_multiple"] / s["n"]
+    columns = np.column_stack(
+        [
+            slope,
+            intercept,
+            r_squared,
+            elasticity,
+            np.exp(log_intercept),
+            log_r_squared,
+            average_multiple,
+        ]
+    )
+    # Plain lists for the state file, with None for the fits NaN stands for (NaN is
+    # not valid JSON)
+    return {
+        group: [int(s["n"][index])]
+        + [None if np.isnan(value) else float(value) for value in columns[index]]
+        for index, group in enumerate(groups)
+    }
+
+
+def written_by_pricing(path):
+    # Whether the workbook at `path` is a chart this module wrote (and may replace)
+    from openpyxl import load_workbook
+
+    try:
+        source = load_workbook(path, read_only=True)
+    except Exception:
+        return False
+    creator = source.properties.creator
+    source.close()
+    return creator == PRICING_CREATOR
+
+
+def load_state(path):
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def update_pricing(
+    rows, output=PRICING_FILENAME, state_path="", window_years=3, min_deals=5
+):
+    # Refits the groups touched by rows that are new, changed or gone since the last
+    # run (all groups without a state file) and rewrites the chart workbook. Returns
+    # the number of groups refitted. A file at `output` that this module did not
+    # write (e.g. a chart built by hand) is left alone and nothing is done.
+    if os.path.exists(output) and not written_by_pricing(output):
+        print(
+            f"{output} was not written by the pricing chart and is not overwritten; "
+            "set pricing_output to another file name"
+        )
+        return 0
+    data = pricing_data(rows)
+    current = OrderedDict()
+    for index, key in enumerate(data["keys"]):
+        current[key] = [
+            float(data["expected_loss"][index]),
+            float(data["spread"][index]),
+            row_groups(
+                data["perils"][index],
+                data["trigger"][index],
+                int(data["year"][index]),
+                window_years,
+            ),
+        ]
+    groups = list(
+        OrderedDict.fromkeys(g for _, _, row in current.values() for g in row)
+    )
+
+    state = load_state(state_path)
+    if state.get("window_years") != window_years:
+        state = {}
+    previous = state.get("rows", {})
+    touched = set()
+    for key in set(previous) | set(current):
+        if previous.get(key) != current.get(key):
+            touched.update(previous.get(key, [None, None, []])[2])
+            touched.update(current.get(key, [None, None, []])[2])
+    old_fits = state.get("fits", {})
+    refit = [group for group in groups if group in touched or group not in old_fits]
+    fits = {group: old_fits[group] for group in groups if group not in refit}
+    fits.update(fit_groups(data, refit))
+    print(f"Pricing regressions: {len(refit)} of {len(groups)} groups refitted")
+
+    if refit or set(old_fits) != set(fits) or not os.path.exists(output):
+        write_pricing_chart(output, data, groups, fits, min_deals)
+        print(f"Pricing chart written to {output}")
+    if state_path:
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump({"window_years": window_years, "rows": current, "fits": fits}, f)
+    return len(refit)
+
+
+def style_header(ws):
+    # Header row styled as in the Transactions sheet
+    from openpyxl.styles import Alignment
+
+    from .export import header_border, header_fill, header_font
+
+    for cell in ws[1]:
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.border = header_border
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+        ws.column_dimensions[cell.column_letter].width = 20
+    ws.column_dimensions["A"].width = 45
+
+
+def write_pricing_chart(output, data, groups, fits, min_deals):
+    from openpyxl import Workbook
+    from openpyxl.chart import Reference, ScatterChart, Series
+    from openpyxl.chart.trendline import Trendline
+
+    wb = Workbook()
+    wb.properties.creator = PRICING_CREATOR
+    ws = wb.active
+    ws.title = "Pricing Chart"
+    ws.append(["Deal", "Date", "Expected Loss", "Spread", "Risk Multiple", "IBRD"])
+    # IBRD deals after the others, so each is one range of the chart
+    order = sorted(range(len(data["keys"])), key=lambda index: data["ibrd"][index])
+    for index in order:
+        x = float(data["expected_loss"][index])
+        y = float(data["spread"][index])
+        ws.append(
+            [
+                data["deals"][index],
+                data["dates"][index],
+                x,
+                y,
+                round(y / x, 2),
+                1 if data["ibrd"][index] else 0,
+            ]
+        )
+    style_header(ws)
+
+    chart = ScatterChart()
+    chart.title = "Spread on Expected Loss"
+    chart.style = 13
+    chart.x_axis.title = "Expected Loss (%)"
+    chart.y_axis.title = "Spread (%)"
+    chart.height = 12
+    chart.width = 24
+    ibrd_count = int(data["ibrd"].sum())
+    other_count = len(order) - ibrd_count
+    for title, first, last in [
+        ("All deals", 2, other_count + 1),
+        ("IBRD", other_count + 2, len(order) + 1),
+    ]:
+        if last < first:
+            continue
+        series = Series(
+            Reference(ws, min_col=4, min_row=first, max_row=last),
+            Reference(ws, min_col=3, min_row=first, max_row=last),
+            title=title,
+        )
+        series.marker.symbol = "circle"
+        series.graphicalProperties.line.noFill = True
+        series.trendline = Trendline(trendlineType="linear", dispRSqr=True, dispEq=True)
+        chart.series.append(series)
+    ws.add_chart(chart, "H2")
+
+    # Groups with at least `min_deals` deals, by grouping; windows are only listed
+    # when they lie within the years covered by the data
+    years = data["year"][data["year"] > 0]
+    first_year, last_year = (years.min(), years.max()) if len(years) else (0, 0)
+    regressions = wb.create_sheet("Regressions")
+    regressions.append(FIT_COLUMNS)
+    groupings = ["all", "peril", "trigger", "year", "window"]
+    for group in sorted(
+        groups, key=lambda group: (groupings.index(group.partition(":")[0]), group)
+    ):
+        fit = fits[group]
+        grouping, _, name = group.partition(":")
+        if fit[0] < min_deals:
+            continue
+        if grouping == "window":
+            first, last = (int(year) for year in name.split("-"))
+            if first < first_year or last > last_year:
+                continue
+        regressions.append([grouping.capitalize(), name] + fit)
+    style_header(regressions)
+    wb.save(output)
+
+
+def pricing_from_config(config, rows):
+    # update_pricing with the pricing_* settings of config.ini; nothing is done when
+    # pricing_output is empty
+    output = config.get("Settings", "pricing_output", fallback=PRICING_FILENAME)
+    if not output:
+        return 0
+    return update_pricing(
+        rows,
+        output,
+        state_path=config.get(
+            "Settings",
+            "pricing_state",
+            fallback=os.path.splitext(output)[0] + ".json",
+        ),
+        window_years=config.getint("Settings", "pricing_window_years", fallback=3),
+        min_deals=config.getint("Settings", "pricing_min_deals", fallback=5),
+    )
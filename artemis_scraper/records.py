@@ -0,0 +1,221 @@
+# Typed records of a deal and its tranches. Amounts and percentages are kept as
+# numbers (None when nothing was found) and are only formatted when a record is
+# written out: Deal.to_rows() is the one place the sheet / store row is built.
+
+from dataclasses import dataclass, field
+
+import datetime
+
+
+def format_amount(value, currency=""):
+    # 150000000.0, "$" -> "$150,000,000.00", as sizes and amounts appear in the sheet
+    return f"{currency}{value:,.2f}"
+
+
+@dataclass(slots=True)
+class Tranche:
+    name: str
+    text: str
+    attachment_probability: float | None = None
+    expected_loss: float | None = None
+    spread: float | None = None
+    attachment_point: float | None = None
+    attachment_point_currency: str = ""
+    size: float | None = None
+    # Written instead of the size when there is none: "Not determined", "Not issued"
+    # (the deal size) or "ERROR" (no tranche size sequence adds up to the deal size)
+    size_note: str = "Size not determined"
+    status: str = "issued"  # or "not_issued" / "pulled", from the tranche text
+
+    @property
+    def issued(self):
+        return self.status == "issued"
+
+    @property
+    def risk_multiple(self):
+        if self.spread is None or self.expected_loss is None:
+            return None
+        if not self.issued or self.expected_loss <= 0:
+            return None
+        return round(self.spread / self.expected_loss, 2)
+
+
+@dataclass(slots=True)
+class TrancheSequence:
+    # Result of the tranche size search: the sizes in millions, in the order they are
+    # assigned to the tranches, when a selection of the quoted amounts adds up to the
+    # deal size
+    status: str  # "matched", "no_match" or "budget_exceeded"
+    sequence: list | None = None
+
+    @property
+    def matched(self):
+        return self.status == "matched"
+
+
+@dataclass(slots=True)
+class Deal:
+    name: str
+    description: str = ""
+    link: str | None = None
+    deal_closed: int | None = None
+    date_of_issue: datetime.datetime | None = None
+    issuer: str = "NA"
+    sponsor: str = "NA"
+    placement_agents: str = "NA"
+    modelling_agents: str = "NA"
+    perils: str = "NA"
+    trigger_type: str = "NA"
+    ratings: str = "NA"
+    size: float | None = None
+    currency: str = ""
+    size_note: str = "Not determined"  # "Not Issued" when the key facts say so
+    maturity: float | None = None
+    maturity_note: str = "Unknown"  # or why the maturity could not be computed
+    attachment_probability: float | None = None
+    expected_loss: float | None = None
+    spread: float | None = None
+    attachment_point: float | None = None
+    attachment_point_currency: str = ""
+    ibrd: bool = False
+    multiple_tranche: bool = False
+    # Sorted tags of the phrase classifier, e.g. ("issuer.ibrd", "peril.earthquake")
+    tags: tuple = ()
+    tranches: list = field(default_factory=list)
+
+    @property
+    def peril_categories(self):
+        return [tag.split(".", 1)[1] for tag in self.tags if tag.startswith("peril.")]
+
+    @property
+    def issue_date_text(self):
+        # "Month YYYY", as parse_maturity expects it, or "NA"
+        if self.date_of_issue is None:
+            return "NA"
+        return self.date_of_issue.strftime("%B %Y")
+
+    @property
+    def risk_multiple(self):
+        if self.spread is None or self.expected_loss is None:
+            return None
+        if self.expected_loss <= 0:
+            return None
+        return round(self.spread / self.expected_loss, 2)
+
+    def row(self, name, size, figures, multiple_tranche, risk_multiple):
+        # One row in the order of columns.headers; `figures` are the attachment
+        # probability, attachment point, expected loss and spread as written
+        attachment_probability, attachment_point, expected_loss, spread = figures
+        return [
+            name,
+            self.date_of_issue,
+            self.issuer,
+            self.sponsor,
+            self.placement_agents,
+            self.modelling_agents,
+            self.perils,
+            size,
+            self.trigger_type,
+            self.ratings,
+            self.maturity if self.maturity is not None else self.maturity_note,
+            attachment_probability,
+            attachment_point,
+            multiple_tranche,
+            expected_loss,
+            spread,
+            risk_multiple,
+            self.deal_closed,
+            1 if self.ibrd else 0,
+            self.description,
+            self.link,
+        ]
+
+    def to_rows(self):
+        # Sheet / store rows of the deal (one per tranche for multi-tranche deals),
+        # with the markers the sheet uses for values that were not found
+        if not self.multiple_tranche:
+            return [
+                self.row(
+                    self.name,
+                    (
+                        format_amount(self.size, self.currency)
+                        if self.size is not None
+                        else self.size_note
+                    ),
+                    written_figures(self),
+                    "No",
+                    marker(self.risk_multiple, "Unknown"),
+                )
+            ]
+        rows = []
+        for tranche in self.tranches:
+            rows.append(
+                self.row(
+                    f"{self.name} Class {tranche.name}",
+                    (
+                        format_amount(tranche.size, self.currency)
+                        if tranche.size is not None
+                        else tranche.size_note
+                    ),
+                    written_figures(tranche),
+                    "Yes",
+                    marker(tranche.risk_multiple, "NA"),
+                )
+            )
+        return rows
+
+
+def found_status(value):
+    return "missing" if value is None else "hit"
+
+
+def extraction_results(deal):
+    # Per row of deal.to_rows(), whether each extracted column was found ("hit"), not
+    # found ("missing") or failed ("error"), from the typed values rather than the
+    # markers written in their place
+    results = []
+    for record in deal.tranches if deal.multiple_tranche else [deal]:
+        if record.size is not None:
+            size = "hit"
+        elif record.size_note == "ERROR":
+            size = "error"
+        else:
+            size = "missing"
+        issued = getattr(record, "issued", True)
+        results.append(
+            {
+                "Size": size,
+                "Maturity": found_status(deal.maturity),
+                "Attachment Probability": found_status(record.attachment_probability),
+                "Attachment Point": found_status(record.attachment_point),
+                "Expected Loss": found_status(record.expected_loss),
+                "Spread": found_status(record.spread if issued else None),
+                "Risk Multiple": found_status(record.risk_multiple),
+            }
+        )
+    return results
+
+
+def marker(value, missing):
+    return value if value is not None else missing
+
+
+def written_figures(record):
+    # Attachment probability, attachment point, expected loss and spread of a deal or
+    # tranche as the sheet shows them
+    if record.attachment_point is not None:
+        attachment_point = format_amount(
+            record.attachment_point, record.attachment_point_currency
+        )
+    else:
+        attachment_point = "Unknown"
+    if not getattr(record, "issued", True):
+        spread = "Not issued"
+    else:
+        spread = marker(record.spread, "NA")
+    return (
+        marker(record.attachment_probability, "None"),
+        attachment_point,
+        marker(record.expected_loss, "NA"),
+        spread,
+    )
@@ -0,0 +1,377 @@
+# Offline re-parse: run extraction again over saved deal pages (a directory or tarball
+# of HTML files, or the page cache) or over the descriptions already in the store /
+# workbook, without fetching anything, and report what changed in each column
+
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import os
+import re
+import csv
+import json
+import time
+import tarfile
+import datetime
+
+from .columns import headers, WORKBOOK_FILENAME, SHEET_NAME
+from .extraction import (
+    read_deal_page,
+    extract_deal_facts,
+    deal_from_facts,
+    worker_settings,
+    init_worker,
+)
+from .store import read_sheet_rows
+
+
+REPARSE_CHUNK_SIZE = 16  # Deals handed to a worker process at a time
+
+
+def saved_pages(source):
+    # Yields (name, link, page_source) for every saved page. Pages from the cache carry
+    # the URL they were fetched from; for plain files the link is read from the page.
+    if os.path.isfile(source) and tarfile.is_tarfile(source):
+        with tarfile.open(source) as archive:
+            for member in archive:
+                if member.isfile() and member.name.lower().endswith((".html", ".htm")):
+                    data = archive.extractfile(member).read()
+                    yield member.name, None, data.decode("utf-8", errors="replace")
+    elif os.path.isdir(os.path.join(source, "entries")):
+        entries_dir = os.path.join(source, "entries")
+        for name in sorted(os.listdir(entries_dir)):
+            try:
+                with open(os.path.join(entries_dir, name), encoding="utf-8") as f:
+                    entry = json.load(f)
+                object_name = entry["content"] + ".html"
+                object_path = os.path.join(source, "objects", object_name)
+                with open(object_path, encoding="utf-8") as f:
+                    yield name, entry["url"], f.read()
+            except (OSError, ValueError, KeyError):
+                continue
+    else:
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.lower().endswith((".html", ".htm")):
+                    path = os.path.join(root, name)
+                    with open(path, encoding="utf-8", errors="replace") as f:
+                        yield path, None, f.read()
+
+
+def saved_page_link(page_source, name):
+    # The canonical URL kept in a saved page, or the name it was saved under
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    soup = BeautifulSoup(
+        page_source, "html.parser", parse_only=SoupStrainer(["link", "meta"])
+    )
+    canonical = soup.find("link", rel="canonical")
+    if canonical is not None and canonical.get("href"):
+        return canonical["href"]
+    og_url = soup.find("meta", property="og:url")
+    if og_url is not None and og_url.get("content"):
+        return og_url["content"]
+    return name
+
+
+def reparse_page(item):
+    # Worker: rows of one saved page, or the error that stopped it. The deal closed
+    # flag is not on the page and is filled in from the previous values afterwards.
+    name, link, page_source = item
+    try:
+        Deal_name, fact_texts, description = read_deal_page(page_source)
+        if Deal_name is None:
+            return name, None, "not a deal page"
+        link = link or saved_page_link(page_source, name)
+        facts = extract_deal_facts(fact_texts)
+        deal = deal_from_facts(Deal_name, facts, description, link, None)
+        deal_rows = deal.to_rows()
+        return link, deal_rows, None
+    except Exception as e:
+        return name, None, str(e)
+
+
+AMOUNT_PATTERN = re.compile(r"(\D*)([\d,]+(?:\.\d+)?)")  # "$150,000,000.00"
+
+
+def stored_size(value):
+    # Deal size fields of a stored Size cell ("$150,000,000.00", a number or a note)
+    if isinstance(value, (int, float)):
+        return {"size": float(value), "currency": "", "size_note": "Not determined"}
+    value = str(value)
+    amount = AMOUNT_PATTERN.fullmatch(value)
+    if amount is None:
+        return {"size": None, "currency": "", "size_note": value}
+    return {
+        "size": float(amount.group(2).replace(",", "")),
+        "currency": amount.group(1),
+        "size_note": "Not determined",
+    }
+
+
+def reparse_stored_rows(stored_rows):
+    # Worker: rebuild the rows of one stored deal from its Description column. The key
+    # facts are taken from the stored row; the deal size of multi-tranche deals is not
+    # stored, so their tranches keep the sizes they had.
+    first = stored_rows[0]
+    link = first[headers.index("Link")]
+    try:
+        Deal_name = re.split(r"\s+Class", str(first[0]).strip())[0]
+        date_of_issue = first[headers.index("Date of issue")]
+        if not isinstance(date_of_issue, datetime.datetime):
+            date_of_issue = None
+        multiple_tranche = first[headers.index("Multiple Tranche")] == "Yes"
+        facts = {
+            "issuer": first[2],
+            "sponsor": first[3],
+            "placement_agents": first[4],
+            "modelling_agents": first[5],
+            "perils": first[6],
+            "trigger_type": first[8],
+            "ratings": first[9],
+            "date_of_issue": date_of_issue,
+        }
+        if not multiple_tranche:
+            facts.update(stored_size(first[7]))
+        deal = deal_from_facts(
+            Deal_name,
+            facts,
+            first[headers.index("Description")],
+            link,
+            first[headers.index("Deal Closed")],
+        )
+        # Stored Size cells are kept as they were, whether a number or formatted text
+        rows = deal.to_rows()
+        sizes = {row_data[0]: row_data[7] for row_data in stored_rows}
+        for row_data in rows:
+            row_data[7] = sizes.get(row_data[0], row_data[7])
+        return link, rows, None
+    except Exception as e:
+        return link, None, str(e)
+
+
+def reparse_chunk(job):
+    function, items = job
+    return [function(item) for item in items]
+
+
+def map_in_processes(function, items, workers):
+    # Yields function(item) in input order. Items are sent to a process pool in chunks,
+    # with at most 2 * workers chunks in flight so an archive is never read into memory
+    # at once. Workers get the extraction settings of this process when they start.
+    if workers <= 1:
+        yield from map(function, items)
+        return
+    items = iter(items)
+    chunks = iter(lambda: list(islice(items, REPARSE_CHUNK_SIZE)), [])
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(worker_settings(),),
+    ) as executor:
+        pending = deque(
+            executor.submit(reparse_chunk, (function, chunk))
+            for chunk in islice(chunks, workers * 2)
+        )
+        while pending:
+            future = pending.popleft()
+            for chunk in islice(chunks, 1):
+                pending.append(executor.submit(reparse_chunk, (function, chunk)))
+            yield from future.result()
+
+
+def previous_rows(store, filename=WORKBOOK_FILENAME, sheet_name=SHEET_NAME):
+    # Current rows of the store, or of the workbook when there is no store
+    if store is not None:
+        return list(store.iter_rows())
+    if not os.path.exists(filename):
+        return []
+    rows = read_sheet_rows(filename, sheet_name)
+    return [row_data for row_data in rows if row_data[0]]
+
+
+def comparable(value):
+    # A cell value as the diff compares it: numbers and amounts as floats, so that
+    # 61200000 and "61,200,000.00" are the same size, anything else as it is
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        amount = AMOUNT_PATTERN.fullmatch(value.strip())
+        if amount is not None and any(c.isdigit() for c in amount.group(2)):
+            return float(amount.group(2).replace(",", ""))
+    return value
+
+
+def is_formula(value):
+    return isinstance(value, str) and value.startswith("=")
+
+
+def diff_rows(old_rows, new_rows):
+    # Per column change counts between two datasets, matching rows on (link, deal).
+    # Returns the counts, the changed cells and the rows only found on either side.
+    # Formula cells of the workbook (such as the Risk Multiple of rows added by hand)
+    # are not evaluated and never count as changed.
+    link_index = headers.index("Link")
+    old = OrderedDict(
+        ((row_data[link_index], row_data[0]), row_data) for row_data in old_rows
+    )
+    new = OrderedDict(
+        ((row_data[link_index], row_data[0]), row_data) for row_data in new_rows
+    )
+    counts = OrderedDict((header, 0) for header in headers)
+    changes = []
+    for key, row_data in new.items():
+        if key not in old:
+            continue
+        for header, old_value, new_value in zip(headers, old[key], row_data):
+            if is_formula(old_value) or is_formula(new_value):
+                continue
+            if comparable(old_value) != comparable(new_value):
+                counts[header] += 1
+                changes.append((key[0], key[1], header, old_value, new_value))
+    added = [key for key in new if key not in old]
+    removed = [key for key in old if key not in new]
+    return counts, changes, added, removed
+
+
+def write_diff_file(path, changes):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Link", "Deal", "Column", "Previous", "Reparsed"])
+        writer.writerows(changes)
+
+
+def reparse(
+    store=None,
+    source="",
+    output="Transactions_Reparsed.xlsx",
+    workers=1,
+    diff_file="",
+    update_store=False,
+    filename=WORKBOOK_FILENAME,
+    sheet_name=SHEET_NAME,
+):
+    # Re-parse `source` (or the stored descriptions when it is empty), export the
+    # rebuilt rows to `output` and report the changes against the previous rows
+    from .export import export_streaming
+
+    started = time.perf_counter()
+    old_rows = previous_rows(store, filename, sheet_name)
+    link_index = headers.index("Link")
+    closed_index = headers.index("Deal Closed")
+    previous_closed = {
+        row_data[link_index]: row_data[closed_index] for row_data in old_rows
+    }
+
+    if source:
+        print(f"Re-parsing saved pages from {source}")
+        function, items = reparse_page, saved_pages(source)
+    else:
+        print(f"Re-parsing the descriptions of {len(old_rows)} stored rows")
+        stored_deals = OrderedDict()
+        for row_data in old_rows:
+            stored_deals.setdefault(row_data[link_index], []).append(row_data)
+        function, items = reparse_stored_rows, list(stored_deals.values())
+
+    reparsed = OrderedDict()
+    failed = 0
+    for link, rows, error in map_in_processes(function, items, workers):
+        if error is not None:
+            print(f"Error re-parsing {link}: {error}")
+            failed += 1
+            continue
+        for row_data in rows:
+            if row_data[closed_index] is None:
+                row_data[closed_index] = previous_closed.get(link, 0)
+        reparsed[link] = rows
+    print(
+        f"{len(reparsed)} deals re-parsed, {failed} skipped, "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+    # Deals keep the position they had in the previous dataset; deals that were not
+    # stored yet follow in the order they were read. The rows of a deal are reversed
+    # as when they are inserted after scraping.
+    positions = {}
+    for position, row_data in enumerate(old_rows):
+        positions.setdefault(row_data[link_index], position)
+    ordered_links = sorted(
+        reparsed, key=lambda link: positions.get(link, len(old_rows))
+    )
+    for link in ordered_links:
+        reparsed[link].reverse()
+    new_rows = [row_data for link in ordered_links for row_data in reparsed[link]]
+
+    # Only deals that were re-parsed are compared, so a partial archive does not report
+    # every other stored deal as removed
+    counts, changes, added, removed = diff_rows(
+        (row_data for row_data in old_rows if row_data[link_index] in reparsed),
+        new_rows,
+    )
+    print("Changed values per column:")
+    for header, count in counts.items():
+        if count:
+            print(f"  {header:<40}{count:>8}")
+    print(
+        f"{len(changes)} values changed, {len(added)} rows added, "
+        f"{len(removed)} rows removed"
+    )
+    if diff_file:
+        write_diff_file(diff_file, changes)
+        print(f"Changed values written to {diff_file}")
+
+    row_count = export_streaming(output, sheet_name, headers, new_rows)
+    print(f"{row_count} rows exported to {output}")
+
+    if store is not None and update_store:
+        updated = 0
+        for link in ordered_links:
+            if link in positions:
+                updated += store.upsert_link_rows(link, reparsed[link])
+        store.record_revisions(new_rows)
+        store.refresh_tags()
+        print(f"{updated} stored rows updated")
+
+
+def benchmark_page_parsers(pages, parsers, repeat=3):
+    # Per page cost of reading a deal page with each parser (best of `repeat` runs),
+    # and the number of pages where the parsers disagree on what they extract
+    timings = OrderedDict((parser, []) for parser in parsers)
+    mismatches = []
+    for name, _, page_source in pages:
+        extracted = {}
+        for parser in parsers:
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = read_deal_page(page_source, parser)
+                seconds = time.perf_counter() - started
+                best = seconds if best is None else min(best, seconds)
+            timings[parser].append(best)
+            Deal_name, fact_texts, description = result
+            extracted[parser] = (
+                Deal_name,
+                [" ".join(text.split()) for text in fact_texts],
+                description,
+            )
+        if len(set(map(repr, extracted.values()))) > 1:
+            mismatches.append(name)
+
+    print(f"{'Parser':<15}{'Pages':>8}{'Mean ms':>10}{'Median ms':>11}{'p95 ms':>9}")
+    for parser, seconds in timings.items():
+        seconds = sorted(seconds)
+        if not seconds:
+            continue
+        print(
+            f"{parser:<15}{len(seconds):>8}"
+            f"{1000 * sum(seconds) / len(seconds):>10.2f}"
+            f"{1000 * seconds[len(seconds) // 2]:>11.2f}"
+            f"{1000 * seconds[int(len(seconds) * 0.95)]:>9.2f}"
+        )
+    totals = [sum(seconds) for seconds in timings.values()]
+    if len(totals) > 1 and all(totals):
+        speed_up = totals[0] / totals[-1]
+        print(f"Speed-up of {parsers[-1]} over {parsers[0]}: {speed_up:.1f}x")
+    print(f"{len(mismatches)} pages extracted differently")
+    for name in mismatches[:10]:
+        print("  ", name)
@@ -0,0 +1,287 @@
+# A scrape of the Artemis deal directory: new and open deals are fetched, parsed and
+# added to the store (or to the workbook when there is no store)
+
+from collections import OrderedDict
+from contextlib import ExitStack
+
+import os
+import time
+
+from .columns import headers, WORKBOOK_FILENAME, SHEET_NAME
+from .fetcher import (
+    DIRECTORY_URL,
+    DIRECTORY_MARKERS,
+    DIRECTORY_SELECTORS,
+    fetcher_from_config,
+)
+from .journal import DealJournal, ERROR, STOP
+from .patterns import PATTERNS
+from .pipeline import ParsePipeline
+from .store import open_store, read_sheet_rows
+
+
+def read_directory(page_source):
+    # Deal links of the directory page and whether each deal is closed (1) or open (0)
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(page_source, "html.parser")
+    table = soup.find_all("table", id="table-deal")[0]
+    deals = table.find_all("tr")
+    links = []
+    deal_closed_status = []
+
+    for deal in deals:
+        tds = deal.find_all("td")
+        if tds:
+            link = tds[0].find("a").get("href")
+            links.append(link)
+            if "background: #C8E6C9" in deal.get("style", ""):
+                deal_closed_status.append(0)
+            else:
+                deal_closed_status.append(
+                    1
+                )  # Deal is closed or no specific indication it's open
+    return links, deal_closed_status
+
+
+def scrape(config, metrics, filename=WORKBOOK_FILENAME, sheet_name=SHEET_NAME):
+    # The store, HTTP sessions, Chrome drivers, parse processes and journal of the run
+    # are closed however it ends
+    with ExitStack() as resources:
+        return scrape_with(resources, config, metrics, filename, sheet_name)
+
+
+def scrape_with(resources, config, metrics, filename, sheet_name):
+    # The scrape, registering what it opens on the `resources` ExitStack
+    from .export import (
+        export_streaming,
+        find_last_closed_deal,
+        format_sheet,
+        merged_rows,
+        open_workbook,
+        write_new_rows,
+    )
+    from .pricing import pricing_from_config
+
+    # The store is the system of record and the workbook is generated from it; with
+    # an empty store_path the workbook itself is used as the database, as before
+    store_path = config.get("Settings", "store_path", fallback="Transactions.sqlite")
+    export_excel = config.getboolean("Settings", "export_excel", fallback=True)
+    # "inplace" edits the existing workbook; "streaming" rewrites the sheet with
+    # openpyxl's write-only mode so memory stays flat and export time is linear in the
+    # number of rows
+    export_mode = config.get("Settings", "export_mode", fallback="inplace")
+
+    # Initialize Last Deal
+    store = None
+    last_deal_name = None
+    original_last_row = None
+    if store_path:
+        store = open_store(store_path, filename, sheet_name)
+        resources.callback(store.close)
+        last_deal_name, last_position = store.last_closed_deal()
+        original_last_row = last_position + 1  # Sheet row, below the header
+        print(
+            "Last Closed Deal Found: ", last_deal_name, ", at row: ", original_last_row
+        )
+    elif export_mode == "streaming":
+        if os.path.exists(filename):
+            last_deal_name, original_last_row = find_last_closed_deal(
+                filename, sheet_name
+            )
+            print(
+                "Last Closed Deal Found: ",
+                last_deal_name,
+                ", at row: ",
+                original_last_row,
+            )
+        else:
+            original_last_row = 1  # Header row
+            print("New File Created")
+    else:
+        wb, ws, last_deal_name, original_last_row = open_workbook(filename, sheet_name)
+
+    # What only the fetch and parse stage uses is closed as soon as it is done
+    fetching = resources.enter_context(ExitStack())
+    fetcher = fetcher_from_config(config, metrics)
+    fetching.callback(fetcher.close)
+
+    # Start by Retrieving Deal List and checking for new deals
+    page_source = fetcher.fetch(
+        config.get("Settings", "directory_url", fallback=DIRECTORY_URL),
+        DIRECTORY_MARKERS,
+        DIRECTORY_SELECTORS,
+    )
+    with metrics.timer("directory_parse"):
+        links, deal_closed_status = read_directory(page_source)
+    metrics.count("directory_links", len(links))
+
+    # Start scraping Links
+    links = links[:1000]  # USE THE FOLLOWING TO CHANGE NUMBER OF TRANSACTIONS SCRAPED
+    deal_closed_status = deal_closed_status[: len(links)]
+
+    # With a store, the directory is diffed against the index of known links: only
+    # new links, deals whose open/closed status changed and (until they close) open
+    # deals are fetched. Without one, every link is fetched until the last closed
+    # deal of the workbook is reached.
+    refresh_open_deals = config.getboolean(
+        "Settings", "refresh_open_deals", fallback=True
+    )
+    refetched_links = set()
+    if store is not None:
+        known_links = store.known_links()
+        fetch_plan = [
+            (link, closed)
+            for link, closed in zip(links, deal_closed_status)
+            if known_links.get(link) != closed or (refresh_open_deals and closed == 0)
+        ]
+        refetched_links = {link for link, _ in fetch_plan if link in known_links}
+        print(
+            f"{len(fetch_plan) - len(refetched_links)} new deals, "
+            f"{len(refetched_links)} known deals to refresh"
+        )
+    else:
+        fetch_plan = list(zip(links, deal_closed_status))
+    planned_links = [link for link, _ in fetch_plan]
+
+    # Every finished deal is journaled as soon as it is parsed; a resumed run skips
+    # the deals already in the journal (failed deals are fetched again)
+    journal_path = config.get(
+        "Settings", "journal_path", fallback="scrape_journal.jsonl"
+    )
+    resume = config.getboolean("Settings", "resume", fallback=False)
+    journal = DealJournal(journal_path, resume)
+    fetching.callback(journal.close)
+    if resume:
+        completed = journal.completed()
+        print(f"Resuming: {len(completed)} deals already in {journal_path}")
+        if journal.stopped():
+            fetch_plan = []
+        else:
+            fetch_plan = [
+                (link, closed) for link, closed in fetch_plan if link not in completed
+            ]
+
+    # Parser processes are started here, before the fetch threads are started
+    pipeline = ParsePipeline(
+        workers=config.getint(
+            "Settings", "parse_workers", fallback=os.cpu_count() or 1
+        ),
+        queue_size=config.getint("Settings", "parse_queue_size", fallback=32),
+        progress_every=config.getint("Settings", "pipeline_progress_every", fallback=0),
+    )
+    fetching.callback(pipeline.close)
+
+    # Pages are fetched concurrently but handed back in directory order, then parsed
+    # in worker processes while the next pages are being fetched
+    scrape_started = time.perf_counter()
+    deal_pages = fetcher.fetch_in_order(
+        [link for link, _ in fetch_plan],
+        closed_flags=[closed for _, closed in fetch_plan],
+    )
+    deal_records = pipeline.run(deal_pages, [closed for _, closed in fetch_plan])
+    fetching.callback(deal_records.close)
+    for link, deal_closed, Deal_name, deal_rows, parse_error, trace in deal_records:
+        if Deal_name is not None:
+            print(Deal_name)
+
+            if store is None and Deal_name == last_deal_name:
+                print("Matching deal found. Stopping scraping.")
+                journal.append(link, deal_closed, Deal_name, status=STOP)
+                break  # Break the loop if a matching deal name is found
+
+        metrics.record_deal(
+            link,
+            Deal_name,
+            deal_rows,
+            trace,
+            None if parse_error is None else str(parse_error),
+        )
+        if parse_error is not None:
+            # Handle the error: log it, print it, or even write it to a file
+            print(f"Error processing transaction {link}: {parse_error}")
+            journal.append(
+                link, deal_closed, Deal_name, status=ERROR, error=str(parse_error)
+            )
+            continue  # Continue with the next transaction
+
+        # Only keep the deal once all of its rows were built
+        journal.append(link, deal_closed, Deal_name, deal_rows)
+    fetching.close()
+
+    # New rows in scrape order, written to the sheet in one pass after scraping. They
+    # are read back from the journal, which also has the deals of an interrupted run.
+    new_rows, fetched_links = journal.materialise(planned_links)
+    metrics.add_time("scrape", time.perf_counter() - scrape_started)
+    if PATTERNS.profile:
+        PATTERNS.print_report(metrics.patterns)
+
+    # Final Formatting
+    if store is not None:
+        # Rows of deals that were already stored are updated in place, keeping their
+        # position. New rows go after the last stored row (after the open deals of
+        # earlier runs, which are older than the new ones) in reverse scrape order, so
+        # the rows of earlier runs never move.
+        inserted_rows = []
+        refreshed_rows = OrderedDict()
+        for row_data in new_rows:
+            if row_data[-1] in refetched_links:
+                refreshed_rows.setdefault(row_data[-1], []).append(row_data)
+            else:
+                inserted_rows.append(row_data)
+        # All the writes of the run are one transaction, and the journal is only
+        # removed once it is committed
+        with metrics.timer("store_write"), store.transaction():
+            store.insert_after(store.count(), reversed(inserted_rows))
+            run_stats = {"inserted": len(inserted_rows), "updated": 0, "unchanged": 0}
+            for link, rows in refreshed_rows.items():
+                changed = store.upsert_link_rows(link, list(reversed(rows)))
+                run_stats["updated"] += changed
+                run_stats["unchanged"] += len(rows) - changed
+            run_stats["pricing_revisions"] = store.record_revisions(new_rows)
+            store.record_links(fetched_links)
+            store.refresh_tags()
+        journal.remove()
+        print("Rows changed in this run:", run_stats)
+        for name, value in run_stats.items():
+            metrics.count(f"rows_{name}", value)
+        # The workbook is a view of the store, streamed again in full when a row was
+        # inserted or a value of a row changed. Refreshed deals whose rows came back
+        # the same (only their last_seen in the link index moved) do not rewrite it.
+        if export_excel and (
+            run_stats["inserted"]
+            or run_stats["updated"]
+            or not os.path.exists(filename)
+        ):
+            with metrics.timer("excel_export"):
+                row_count = export_streaming(
+                    filename, sheet_name, headers, store.iter_rows()
+                )
+            print(f"{row_count} rows exported to {filename}")
+        with metrics.timer("pricing"):
+            pricing_from_config(config, store.iter_rows())
+    elif export_mode == "streaming":
+        with metrics.timer("excel_export"):
+            row_count = export_streaming(
+                filename,
+                sheet_name,
+                headers,
+                merged_rows(filename, sheet_name, headers, new_rows, original_last_row),
+            )
+        print(f"{len(new_rows)} new rows added, {row_count} rows exported")
+    else:
+        with metrics.timer("excel_export"):
+            write_new_rows(ws, new_rows, original_last_row)
+            print(f"{len(new_rows)} new rows added")
+            wb.save(filename)
+            format_sheet(ws)
+            wb.save(filename)
+
+    # Everything in the journal is now in the workbook
+    if store is None:
+        journal.remove()
+
+    # The pricing chart is refitted from the new contents of the store / workbook
+    if store is None:
+        with metrics.timer("pricing"):
+            pricing_from_config(config, read_sheet_rows(filename, sheet_name))
@@ -0,0 +1,303 @@
+# SQLite store of the scraped rows, the system of record the workbook is exported from
+
+from contextlib import contextmanager
+
+import os
+import re
+import sqlite3
+import datetime
+
+from .columns import headers, STORE_COLUMNS, WORKBOOK_FILENAME, SHEET_NAME
+from .phrases import PHRASES
+
+
+def read_sheet_rows(filename, sheet_name):
+    # Data rows of a Transactions sheet, cut or padded to the width of the headers
+    # (sheets edited by hand can report thousands of empty columns)
+    from openpyxl import load_workbook
+
+    source = load_workbook(filename, read_only=True)
+    rows = []
+    if sheet_name in source.sheetnames:
+        for values in source[sheet_name].iter_rows(min_row=2, values_only=True):
+            if any(value is not None for value in values):
+                values = list(values[: len(headers)])
+                rows.append(values + [None] * (len(headers) - len(values)))
+    source.close()
+    return rows
+
+
+class DealStore:
+    # SQLite system of record for the scraped rows (one row per deal or tranche, in
+    # sheet order). Columns are left untyped because several of them mix numbers with
+    # markers such as "NA" or "Not issued"; dates are stored as ISO strings.
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.transaction_depth = 0
+        self.columns = list(STORE_COLUMNS.values())
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS deals (
+                id INTEGER PRIMARY KEY,
+                row_order INTEGER NOT NULL,
+                {", ".join(self.columns)}
+            );
+            CREATE INDEX IF NOT EXISTS deals_row_order ON deals (row_order);
+            CREATE INDEX IF NOT EXISTS deals_link ON deals (link);
+            CREATE INDEX IF NOT EXISTS deals_deal ON deals (deal);
+            CREATE INDEX IF NOT EXISTS deals_date_of_issue ON deals (date_of_issue);
+            CREATE INDEX IF NOT EXISTS deals_closed ON deals (deal_closed, row_order);
+            CREATE TABLE IF NOT EXISTS links (
+                link TEXT PRIMARY KEY,
+                deal_closed INTEGER,
+                first_seen TEXT,
+                last_seen TEXT
+            );
+            CREATE TABLE IF NOT EXISTS deal_revisions (
+                id INTEGER PRIMARY KEY,
+                link TEXT,
+                deal TEXT,
+                observed_at TEXT,
+                deal_closed INTEGER,
+                size,
+                expected_loss,
+                spread,
+                risk_multiple
+            );
+            CREATE INDEX IF NOT EXISTS deal_revisions_deal
+                ON deal_revisions (link, deal, id);
+            CREATE TABLE IF NOT EXISTS deal_tags (
+                link TEXT,
+                deal TEXT,
+                tag TEXT
+            );
+            CREATE INDEX IF NOT EXISTS deal_tags_tag ON deal_tags (tag, link);
+            """
+        )
+        # Index the links of rows stored before the links table existed (or imported
+        # from a workbook)
+        with self.transaction():
+            self.connection.execute(
+                "INSERT OR IGNORE INTO links (link, deal_closed, first_seen, last_seen) "
+                "SELECT link, MAX(deal_closed), ?, ? FROM deals "
+                "WHERE link IS NOT NULL GROUP BY link",
+                (self.now(), self.now()),
+            )
+
+    @contextmanager
+    def transaction(self):
+        # Commit the writes made inside on exit, or roll them all back on an error.
+        # Nested blocks join the outer transaction, so several writes can be
+        # committed together.
+        if self.transaction_depth:
+            self.transaction_depth += 1
+            try:
+                yield
+            finally:
+                self.transaction_depth -= 1
+            return
+        self.transaction_depth = 1
+        try:
+            with self.connection:
+                yield
+        finally:
+            self.transaction_depth = 0
+
+    @staticmethod
+    def now():
+        return datetime.datetime.now().isoformat(timespec="seconds")
+
+    @staticmethod
+    def to_db(row_data):
+        return [
+            value.isoformat() if isinstance(value, datetime.datetime) else value
+            for value in row_data
+        ]
+
+    @staticmethod
+    def from_db(values):
+        row_data = list(values)
+        date_index = headers.index("Date of issue")
+        if isinstance(row_data[date_index], str):
+            try:
+                row_data[date_index] = datetime.datetime.fromisoformat(
+                    row_data[date_index]
+                )
+            except ValueError:
+                pass
+        return row_data
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM deals").fetchone()[0]
+
+    def insert_after(self, position, rows):
+        # Insert `rows` (in final sheet order) after the row at `position`, shifting the
+        # rows below with a single indexed update
+        rows = [self.to_db(row_data) for row_data in rows]
+        if not rows:
+            return
+        placeholders = ", ".join("?" for _ in self.columns)
+        with self.transaction():
+            self.connection.execute(
+                "UPDATE deals SET row_order = row_order + ? WHERE row_order > ?",
+                (len(rows), position),
+            )
+            self.connection.executemany(
+                f"INSERT INTO deals (row_order, {', '.join(self.columns)}) "
+                f"VALUES (?, {placeholders})",
+                (
+                    [position + offset] + row_data
+                    for offset, row_data in enumerate(rows, start=1)
+                ),
+            )
+
+    def import_workbook(self, filename, sheet_name):
+        # One-off migration of an existing Transactions sheet into the store
+        rows = read_sheet_rows(filename, sheet_name)
+        self.insert_after(0, rows)
+        return len(rows)
+
+    def known_links(self):
+        return dict(self.connection.execute("SELECT link, deal_closed FROM links"))
+
+    def record_links(self, statuses):
+        # Upsert (link, deal_closed) pairs into the link index
+        now = self.now()
+        with self.transaction():
+            self.connection.executemany(
+                "INSERT INTO links (link, deal_closed, first_seen, last_seen) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (link) DO UPDATE SET "
+                "deal_closed = excluded.deal_closed, last_seen = excluded.last_seen",
+                ((link, closed, now, now) for link, closed in statuses),
+            )
+
+    def replace_link_rows(self, link, rows):
+        # Replace the rows of an already stored deal in place, keeping its position
+        rows = [self.to_db(row_data) for row_data in rows]
+        first, count = self.connection.execute(
+            "SELECT MIN(row_order), COUNT(*) FROM deals WHERE link = ?", (link,)
+        ).fetchone()
+        if first is None:
+            return False
+        placeholders = ", ".join("?" for _ in self.columns)
+        with self.transaction():
+            self.connection.execute("DELETE FROM deals WHERE link = ?", (link,))
+            self.connection.execute(
+                "UPDATE deals SET row_order = row_order + ? WHERE row_order >= ?",
+                (len(rows) - count, first + count),
+            )
+            self.connection.executemany(
+                f"INSERT INTO deals (row_order, {', '.join(self.columns)}) "
+                f"VALUES (?, {placeholders})",
+                ([first + offset] + row_data for offset, row_data in enumerate(rows)),
+            )
+        return True
+
+    def upsert_link_rows(self, link, rows):
+        # Update the stored rows of a deal in place and return how many of them changed.
+        # If the number of tranches changed the deal's rows are replaced instead.
+        rows = [self.to_db(row_data) for row_data in rows]
+        existing = self.connection.execute(
+            f"SELECT id, {', '.join(self.columns)} FROM deals "
+            "WHERE link = ? ORDER BY row_order",
+            (link,),
+        ).fetchall()
+        if len(existing) != len(rows):
+            self.replace_link_rows(link, rows)
+            return len(rows)
+        assignments = ", ".join(f"{column} = ?" for column in self.columns)
+        changed = 0
+        with self.transaction():
+            for (row_id, *old_values), row_data in zip(existing, rows):
+                if old_values != row_data:
+                    self.connection.execute(
+                        f"UPDATE deals SET {assignments} WHERE id = ?",
+                        row_data + [row_id],
+                    )
+                    changed += 1
+        return changed
+
+    def record_revisions(self, rows):
+        # Append a pricing revision for every row whose size, expected loss, spread or
+        # risk multiple differs from the latest revision stored for that deal / tranche
+        fields = ["deal_closed", "size", "expected_loss", "spread", "risk_multiple"]
+        indices = [self.columns.index(field) for field in fields]
+        deal_index = self.columns.index("deal")
+        link_index = self.columns.index("link")
+        recorded = 0
+        with self.transaction():
+            for row_data in rows:
+                row_data = self.to_db(row_data)
+                values = [row_data[i] for i in indices]
+                latest = self.connection.execute(
+                    f"SELECT {', '.join(fields)} FROM deal_revisions "
+                    "WHERE link = ? AND deal = ? ORDER BY id DESC LIMIT 1",
+                    (row_data[link_index], row_data[deal_index]),
+                ).fetchone()
+                # A change of status alone (e.g. the deal closing) is not a revision
+                if latest is not None and list(latest[1:]) == values[1:]:
+                    continue
+                self.connection.execute(
+                    f"INSERT INTO deal_revisions (link, deal, observed_at, "
+                    f"{', '.join(fields)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [row_data[link_index], row_data[deal_index], self.now()] + values,
+                )
+                recorded += 1
+        return recorded
+
+    def refresh_tags(self):
+        # Rebuild the phrase classifier tags of every row (issuer type, peril
+        # categories, multiple tranches, not issued), so rows can be selected and
+        # grouped by tag with an indexed lookup
+        cursor = self.connection.execute(
+            "SELECT link, deal, issuer, risks_perils_covered, multiple_tranche, spread "
+            "FROM deals"
+        )
+        tags = []
+        for link, deal, issuer, perils, multiple_tranche, spread in cursor:
+            row_tags = PHRASES.tags(issuer, "issuer") + PHRASES.tags(perils, "peril")
+            if multiple_tranche == "Yes":
+                row_tags += ("structure.multiple_tranches",)
+            if spread == "Not issued":
+                row_tags += ("status.not_issued",)
+            tags.extend((link, deal, tag) for tag in row_tags)
+        with self.transaction():
+            self.connection.execute("DELETE FROM deal_tags")
+            self.connection.executemany(
+                "INSERT INTO deal_tags (link, deal, tag) VALUES (?, ?, ?)", tags
+            )
+        return len(tags)
+
+    def last_closed_deal(self):
+        # Returns the deal name (without its " Class ..." suffix) and the position of
+        # the last row of a closed deal, or (None, 0) if there is none
+        found = self.connection.execute(
+            "SELECT deal, row_order FROM deals "
+            "WHERE deal_closed = 1 AND deal IS NOT NULL "
+            "ORDER BY row_order DESC LIMIT 1"
+        ).fetchone()
+        if found is None:
+            return None, 0
+        return re.split(r"\s+Class", found[0].strip())[0], found[1]
+
+    def iter_rows(self):
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(self.columns)} FROM deals ORDER BY row_order"
+        )
+        for values in cursor:
+            yield self.from_db(values)
+
+    def close(self):
+        self.connection.close()
+
+
+def open_store(path, filename=WORKBOOK_FILENAME, sheet_name=SHEET_NAME):
+    # Open the store at `path`, importing the rows of an existing workbook into it
+    # the first time it is used
+    store = DealStore(path)
+    if store.count() == 0 and os.path.exists(filename):
+        imported = store.import_workbook(filename, sheet_name)
+        print(f"Imported {imported} rows from {filename} into {path}")
+    return store
@@ -0,0 +1,45 @@
+# Shared fixtures: the descriptions of the example workbook, the corpus the
+# regression tests compare the extraction functions on
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(ROOT, "tests", "data")
+EXAMPLE_WORKBOOK = os.path.join(ROOT, "examples", "Transactions_Chart.xlsx")
+
+# The package is used from the checkout, as python -m artemis_scraper does
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def example_rows():
+    # Rows of the Transactions sheet, as dictionaries by header
+    from openpyxl import load_workbook
+
+    from artemis_scraper.columns import headers
+
+    source = load_workbook(EXAMPLE_WORKBOOK, read_only=True)
+    rows = [
+        dict(zip(headers, values))
+        for values in source["Transactions"].iter_rows(
+            min_row=2, max_col=len(headers), values_only=True
+        )
+    ]
+    source.close()
+    return rows
+
+
+@pytest.fixture(scope="session")
+def example_descriptions(example_rows):
+    # Unique descriptions of the Transactions sheet, in sheet order
+    descriptions = []
+    seen = set()
+    for row in example_rows:
+        description = row["Description"]
+        if isinstance(description, str) and description not in seen:
+            seen.add(description)
+            descriptions.append(description)
+    return descriptions
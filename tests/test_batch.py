@@ -0,0 +1,26 @@
+# Batch extraction with the default arguments: descriptions without dates of issue
+# print nothing, and their maturity is missing unless the text gives both dates
+
+import math
+
+from artemis_scraper.batch import MISSING, FOUND, extract_batch
+
+
+def test_defaults_print_nothing(capfd, example_descriptions):
+    descriptions = example_descriptions[:200] + [
+        "Cover starting from June 2024 with a maturity due in June 2027."
+    ]
+    columns = extract_batch(descriptions)
+    out, err = capfd.readouterr()
+    assert out == ""
+    assert len(columns["maturity"]) == len(descriptions)
+    assert set(columns["maturity_status"][:-1]) <= {MISSING, FOUND}
+    assert columns["maturity_status"][-1] == FOUND
+    assert columns["maturity"][-1] == 3.0
+
+
+def test_missing_date_is_missing(capfd):
+    columns = extract_batch(["A three-year deal."], workers=1)
+    assert capfd.readouterr().out == ""
+    assert columns["maturity_status"] == [MISSING]
+    assert math.isnan(columns["maturity"][0])
@@ -0,0 +1,47 @@
+# Streaming export of the example workbook: the other sheets are kept and old rows are
+# cut to the headers, so the export stays quick on sheets with thousands of columns
+
+import shutil
+import time
+
+from openpyxl import load_workbook
+
+from artemis_scraper.columns import headers
+from artemis_scraper.export import export_streaming, merged_rows
+
+from conftest import EXAMPLE_WORKBOOK
+
+
+def test_streaming_example_workbook(tmp_path):
+    filename = str(tmp_path / "Transactions_Chart.xlsx")
+    shutil.copy(EXAMPLE_WORKBOOK, filename)
+    source = load_workbook(filename, read_only=True)
+    sheet_names = list(source.sheetnames)
+    legend = list(source["Legend"].iter_rows(values_only=True))
+    source.close()
+
+    started = time.perf_counter()
+    row_count = export_streaming(
+        filename,
+        "Transactions",
+        headers,
+        merged_rows(filename, "Transactions", headers, [], 1),
+    )
+    assert time.perf_counter() - started < 60
+
+    exported = load_workbook(filename, read_only=True)
+    assert exported.sheetnames == sheet_names
+    rows = list(exported["Transactions"].iter_rows(values_only=True))
+    copied_legend = list(exported["Legend"].iter_rows(values_only=True))
+    exported.close()
+    assert row_count == len(rows) - 1 == 1227
+    assert {len(row) for row in rows} == {len(headers)}
+    assert list(map(trimmed, copied_legend)) == list(map(trimmed, legend))
+
+
+def trimmed(row):
+    # A row without its empty cells at the end
+    row = list(row)
+    while row and row[-1] is None:
+        row.pop()
+    return row
@@ -0,0 +1,148 @@
+# DealPageFetcher against a local stub HTTP server (http.server, which sends
+# text/html without a charset) serving generated deal pages
+
+import os
+import threading
+import functools
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from artemis_scraper.extraction import read_deal_page
+from artemis_scraper.fetcher import DealPageCache, DealPageFetcher
+from artemis_scraper.metrics import RunMetrics
+
+DEAL_PAGE = """<!DOCTYPE html><html><head>{meta}<title>{name}</title></head>
+<body><div id="info-box"><h2>{name} – at a glance</h2><ul>
+<li>Issuer: {name}</li><li>Size: $100m</li></ul></div>
+<div class="pf-content"><p>{name} will provide Zürich-based cover. The Class A
+notes priced with a spread of 5.5%.</p></div></body></html>
+"""
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server(tmp_path):
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    for index in range(12):
+        name = f"Stub Re Ltd. (Series 2024-{index})"
+        page = DEAL_PAGE.format(meta="", name=name)
+        (pages / f"deal{index}.html").write_bytes(page.encode("utf-8"))
+    page = DEAL_PAGE.format(
+        meta='<meta charset="windows-1252">', name="Stub Re Ltd. (Series 1252)"
+    )
+    (pages / "cp1252.html").write_bytes(page.encode("windows-1252"))
+    handler = functools.partial(QuietHandler, directory=str(pages))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def fetcher(**kwargs):
+    return DealPageFetcher(
+        max_workers=4, requests_per_second=0, metrics=RunMetrics(), **kwargs
+    )
+
+
+def test_pages_come_back_in_order(stub_server):
+    urls = [f"{stub_server}/deal{index}.html" for index in range(12)]
+    http = fetcher()
+    results = list(http.fetch_in_order(urls))
+    assert [url for url, _, _ in results] == urls
+    assert all(error is None for _, _, error in results)
+    names = [read_deal_page(page_source)[0] for _, page_source, _ in results]
+    assert names == [f"Stub Re Ltd. (Series 2024-{index})" for index in range(12)]
+    # Every page had its content in the static HTML, so Chrome was never needed
+    assert "http_fallbacks_to_browser" not in http.metrics.counters
+    assert http.metrics.counters["pages_from_http"] == 12
+
+
+def test_utf8_page_without_charset_header(stub_server):
+    page_source = fetcher().fetch(f"{stub_server}/deal0.html")
+    assert "– at a glance" in page_source
+    assert "Zürich" in page_source
+    _, _, description = read_deal_page(page_source)
+    assert "Zürich-based" in description
+
+
+def test_meta_charset(stub_server):
+    page_source = fetcher().fetch(f"{stub_server}/cp1252.html")
+    assert read_deal_page(page_source)[0] == "Stub Re Ltd. (Series 1252)"
+    assert "Zürich" in page_source
+
+
+def test_cached_pages_are_revalidated(stub_server, tmp_path):
+    cache = DealPageCache(str(tmp_path / "cache"), open_ttl=0)
+    url = f"{stub_server}/deal3.html"
+    first = fetcher(cache=cache).fetch(url)
+    second = fetcher(cache=cache).fetch(url)
+    assert first == second
+    assert cache.misses == 2
+    assert cache.revalidated == 1  # If-Modified-Since answered with 304
+    assert os.listdir(cache.objects_dir) == [cache.digest(first.encode()) + ".html"]
+
+
+def test_read_after_eviction_is_a_miss(tmp_path):
+    # A body evicted between lookup and read: the read gives nothing and drops the
+    # entry instead of raising or writing it back without its body
+    cache = DealPageCache(str(tmp_path / "cache"))
+    url = "http://127.0.0.1/deal.html"
+    cache.store(url, "<html>deal</html>", closed=True)
+    entry = cache.lookup(url)
+    os.remove(cache.object_path(entry["content"]))
+    assert cache.read(entry) is None
+    assert not os.path.exists(cache.entry_path(url))
+    assert cache.lookup(url) is None
+
+
+def test_read_of_a_replaced_entry_keeps_the_new_one(tmp_path):
+    cache = DealPageCache(str(tmp_path / "cache"))
+    url = "http://127.0.0.1/deal.html"
+    cache.store(url, "<html>old</html>")
+    entry = cache.lookup(url)
+    cache.store(url, "<html>new</html>")
+    assert cache.read(entry) is None
+    assert cache.read(cache.lookup(url)) == "<html>new</html>"
+
+
+def test_concurrent_reads_and_evictions(tmp_path):
+    # Readers racing a writer that keeps the cache over its size limit
+    cache = DealPageCache(str(tmp_path / "cache"), max_bytes=2000)
+    urls = [f"http://127.0.0.1/deal{index}.html" for index in range(20)]
+    errors = []
+
+    def write():
+        for round_number in range(10):
+            for url in urls:
+                cache.store(url, f"<html>{url} {round_number}</html>" + " " * 200)
+
+    def read():
+        try:
+            for _ in range(10):
+                for url in urls:
+                    entry = cache.lookup(url)
+                    if entry is not None:
+                        page_source = cache.read(entry)
+                        assert page_source is None or url in page_source
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write)]
+    threads += [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    for url in urls:
+        entry = cache.lookup(url)
+        if entry is not None:
+            assert os.path.exists(cache.object_path(entry["content"]))
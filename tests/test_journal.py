@@ -0,0 +1,53 @@
+# Scrape journal and store writes: a new run keeps the journal of an unfinished one,
+# and the store writes of a run are committed or rolled back together
+
+import os
+
+import pytest
+
+from artemis_scraper.columns import headers
+from artemis_scraper.journal import DealJournal
+from artemis_scraper.store import DealStore
+
+
+def deal_row(name, link):
+    row_data = [None] * len(headers)
+    row_data[0] = name
+    row_data[headers.index("Deal Closed")] = 1
+    row_data[headers.index("Link")] = link
+    return row_data
+
+
+def test_new_run_keeps_unfinished_journal(tmp_path):
+    path = str(tmp_path / "scrape_journal.jsonl")
+    journal = DealJournal(path)
+    journal.append("https://example.com/a", 1, "A Re", [deal_row("A Re", "a")])
+    journal.close()
+
+    DealJournal(path).close()
+    kept = [name for name in os.listdir(tmp_path) if name != "scrape_journal.jsonl"]
+    assert len(kept) == 1 and kept[0].startswith("scrape_journal.")
+    resumed = DealJournal(str(tmp_path / kept[0]), resume=True)
+    assert resumed.completed() == {"https://example.com/a"}
+    resumed.close()
+    assert os.path.getsize(path) == 0
+
+
+def test_store_writes_roll_back_together(tmp_path):
+    store = DealStore(str(tmp_path / "store.sqlite"))
+    store.insert_after(0, [deal_row("A Re", "a")])
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.insert_after(1, [deal_row("B Re", "b")])
+            store.record_links([("b", 1)])
+            store.refresh_tags()
+            raise RuntimeError("interrupted")
+    assert store.count() == 1
+    assert "b" not in store.known_links()
+
+    with store.transaction():
+        store.insert_after(1, [deal_row("B Re", "b")])
+        store.record_links([("b", 1)])
+    assert store.count() == 2
+    assert store.known_links()["b"] == 1
+    store.close()
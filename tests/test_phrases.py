@@ -0,0 +1,41 @@
+# Phrase classifier: phrases are whole words (or their plurals), and the multiple
+# tranche check and IBRD flag come from the same scan as the tags
+
+from artemis_scraper.extraction import check_multiple_tranche
+from artemis_scraper.phrases import PhraseClassifier, PHRASES
+
+
+def test_phrases_match_whole_words():
+    assert PHRASES.tags("Windfall profits of a firm in good standing", "peril") == ()
+    assert PHRASES.tags("Severely affected healthcare firearms", "peril") == ()
+    assert PHRASES.tags("Hail, wind and fire", "peril") == (
+        "peril.severe_weather",
+        "peril.wildfire",
+        "peril.wind",
+    )
+
+
+def test_phrases_match_plurals_and_punctuation():
+    assert PHRASES.tags("Named storms, hurricanes & earthquakes.", "peril") == (
+        "peril.earthquake",
+        "peril.wind",
+    )
+    assert PHRASES.tags("Germany flood, hailstorm", "peril") == (
+        "peril.flood",
+        "peril.severe_weather",
+    )
+    assert PHRASES.tags("Class B won't be issued", "status") == ("status.not_issued",)
+
+
+def test_phrase_inside_another_phrase():
+    # "quake" inside "earthquake" ends a word but does not start one
+    classifier = PhraseClassifier({"a.quake": ("quake",), "a.earth": ("earthquake",)})
+    assert classifier.tags("earthquake") == ("a.earth",)
+    assert classifier.tags("quakes") == ("a.quake",)
+
+
+def test_multiple_tranche_and_ibrd_use_the_scan():
+    assert check_multiple_tranche("Two tranches of notes") == "Yes"
+    assert check_multiple_tranche("Subtranches of notes") == "No"
+    assert PHRASES.has("issuer.ibrd", "IBRD CAR Mexico 2020")
+    assert not PHRASES.has("issuer.ibrd", "Ibrdx Re")
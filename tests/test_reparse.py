@@ -0,0 +1,54 @@
+# Re-parsing stored rows: an unchanged row reports no changes, whether its cells hold
+# numbers, formatted amounts or workbook formulas
+
+from collections import OrderedDict
+
+from artemis_scraper.columns import headers
+from artemis_scraper.reparse import diff_rows, reparse_stored_rows
+
+
+def stored_deals(rows):
+    # Rows grouped by deal link, as reparse hands them to the workers
+    deals = OrderedDict()
+    for row_data in rows:
+        deals.setdefault(row_data[headers.index("Link")], []).append(row_data)
+    return list(deals.values())
+
+
+def reparsed_rows(rows):
+    reparsed = []
+    for link, deal_rows, error in map(reparse_stored_rows, stored_deals(rows)):
+        assert error is None, (link, error)
+        reparsed.extend(reversed(deal_rows))
+    return reparsed
+
+
+def test_unchanged_rows_have_no_changes(example_rows):
+    rows = [[row[header] for header in headers] for row in example_rows if row["Deal"]]
+    reparsed = reparsed_rows(rows)
+    counts, changes, added, removed = diff_rows(reparsed, reparsed_rows(reparsed))
+    assert changes == [] and added == [] and removed == []
+
+
+def test_stored_numbers_and_formulas_are_not_changes(example_rows):
+    # Sizes stored as numbers and Risk Multiple formulas of the example workbook
+    rows = [[row[header] for header in headers] for row in example_rows if row["Deal"]]
+    counts, changes, added, removed = diff_rows(rows, reparsed_rows(rows))
+    assert counts["Size"] == 0
+    assert counts["Risk Multiple"] == 0
+
+
+def test_stored_size_cell_is_kept():
+    row = [None] * len(headers)
+    row[0] = "Example Re Ltd. (Series 2024-1)"
+    row[headers.index("Size")] = 61200000
+    row[headers.index("Multiple Tranche")] = "No"
+    row[headers.index("Risk Multiple")] = "=Table2[[#This Row],[Spread]]/2"
+    row[headers.index("Description")] = "Example Re Ltd. provides $61.2m of cover."
+    row[headers.index("Link")] = "https://www.artemis.bm/deal-directory/example-re/"
+    reparsed = reparsed_rows([row])
+    assert reparsed[0][headers.index("Size")] == 61200000
+    counts, changes, added, removed = diff_rows([row], reparsed)
+    assert [
+        change[2] for change in changes if change[2] in ("Size", "Risk Multiple")
+    ] == []
@@ -0,0 +1,150 @@
+# Scrapes with a stub fetcher: a scrape that fails part way closes what it opened
+# (the fetcher, parse processes, journal and store), and incremental runs keep the
+# order of the stored rows and only rewrite the workbook when a row changed
+
+import os
+import configparser
+
+import pytest
+
+import artemis_scraper.scrape as scrape_module
+from artemis_scraper.metrics import RunMetrics
+from artemis_scraper.store import DealStore
+
+DIRECTORY_PAGE = """<html><body><table id="table-deal">
+<tr><td><a href="https://example.com/deal-1/">Deal 1</a></td></tr>
+<tr><td><a href="https://example.com/deal-2/">Deal 2</a></td></tr>
+</table></body></html>"""
+
+
+class StubFetcher:
+    # Serves the directory, and fetch errors for the deal pages
+    def __init__(self):
+        self.closed = False
+
+    def fetch(self, url, markers=None, selectors=None, closed=False):
+        return DIRECTORY_PAGE
+
+    def fetch_in_order(self, urls, closed_flags=None):
+        for url in urls:
+            yield url, None, ConnectionError("refused")
+
+    def close(self):
+        self.closed = True
+
+
+class FailingMetrics(RunMetrics):
+    # Fails while the first deal is being recorded, as an interrupt would
+    def record_deal(self, *args):
+        raise RuntimeError("interrupted")
+
+
+def test_failed_scrape_closes_resources(tmp_path, monkeypatch):
+    fetcher = StubFetcher()
+    opened = {}
+    monkeypatch.setattr(scrape_module, "fetcher_from_config", lambda *_: fetcher)
+
+    open_store = scrape_module.open_store
+
+    def tracked_store(*args):
+        opened["store"] = open_store(*args)
+        return opened["store"]
+
+    journal_class = scrape_module.DealJournal
+
+    def tracked_journal(*args):
+        opened["journal"] = journal_class(*args)
+        return opened["journal"]
+
+    monkeypatch.setattr(scrape_module, "open_store", tracked_store)
+    monkeypatch.setattr(scrape_module, "DealJournal", tracked_journal)
+
+    config = configparser.ConfigParser()
+    config["Settings"] = {
+        "store_path": str(tmp_path / "Transactions.sqlite"),
+        "journal_path": str(tmp_path / "scrape_journal.jsonl"),
+        "parse_workers": "1",
+    }
+    with pytest.raises(RuntimeError):
+        scrape_module.scrape(
+            config, FailingMetrics(), str(tmp_path / "Transactions_Chart.xlsx")
+        )
+    assert fetcher.closed
+    assert opened["journal"].file.closed
+    with pytest.raises(Exception):
+        opened["store"].count()  # Closed connection
+
+
+DEAL_PAGE = """<html><head><title>{name}</title></head><body>
+<div id="info-box"><h2>{name} – at a glance</h2><ul><li>Issuer: {name}</li>
+<li>Size: $100m</li><li>Date of issue: {issued}</li></ul></div>
+<div class="pf-content"><p>{name} provides cover with a spread of {spread}%.</p>
+</div></body></html>"""
+
+
+class DirectoryFetcher(StubFetcher):
+    # A directory of (name, open, spread) deals, newest first, and their pages
+    def __init__(self, deals):
+        super().__init__()
+        self.deals = deals
+
+    def link(self, name):
+        return f"https://example.com/{name.split()[0].lower()}/"
+
+    def fetch(self, url, markers=None, selectors=None, closed=False):
+        rows = "".join(
+            f'<tr style="{"background: #C8E6C9" if is_open else ""}">'
+            f'<td><a href="{self.link(name)}">{name}</a></td></tr>'
+            for name, is_open, _ in self.deals
+        )
+        return f'<html><body><table id="table-deal">{rows}</table></body></html>'
+
+    def fetch_in_order(self, urls, closed_flags=None):
+        pages = {
+            self.link(name): DEAL_PAGE.format(
+                name=name, spread=spread, issued=f"Jun {2020 + index}"
+            )
+            for index, (name, _, spread) in enumerate(reversed(self.deals))
+        }
+        for url in urls:
+            yield url, pages[url], None
+
+
+def run(tmp_path, monkeypatch, deals):
+    monkeypatch.setattr(
+        scrape_module, "fetcher_from_config", lambda *_: DirectoryFetcher(deals)
+    )
+    config = configparser.ConfigParser()
+    config["Settings"] = {
+        "store_path": str(tmp_path / "Transactions.sqlite"),
+        "journal_path": str(tmp_path / "scrape_journal.jsonl"),
+        "parse_workers": "1",
+        "pricing_output": "",
+    }
+    scrape_module.scrape(
+        config, RunMetrics(), str(tmp_path / "Transactions_Chart.xlsx")
+    )
+    store = DealStore(str(tmp_path / "Transactions.sqlite"))
+    names = [row_data[0] for row_data in store.iter_rows()]
+    store.close()
+    return names
+
+
+def test_incremental_runs_keep_row_order(tmp_path, monkeypatch):
+    workbook = tmp_path / "Transactions_Chart.xlsx"
+    deals = [("Bravo Re", True, 6), ("Alpha Re", False, 5)]
+    assert run(tmp_path, monkeypatch, deals) == ["Alpha Re", "Bravo Re"]
+    exported = os.stat(workbook).st_mtime_ns
+
+    # The open deal is refreshed and comes back unchanged: the workbook is left as is
+    assert run(tmp_path, monkeypatch, deals) == ["Alpha Re", "Bravo Re"]
+    assert os.stat(workbook).st_mtime_ns == exported
+
+    # A new deal goes after the open one, which keeps its place
+    deals = [("Charlie Re", False, 7)] + deals
+    assert run(tmp_path, monkeypatch, deals) == ["Alpha Re", "Bravo Re", "Charlie Re"]
+    assert os.stat(workbook).st_mtime_ns != exported
+
+    # The open deal closes with a new spread and is updated in place
+    deals = [("Charlie Re", False, 7), ("Bravo Re", False, 6.5), ("Alpha Re", False, 5)]
+    assert run(tmp_path, monkeypatch, deals) == ["Alpha Re", "Bravo Re", "Charlie Re"]
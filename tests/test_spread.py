@@ -0,0 +1,52 @@
+# parse_spread against the outputs of the original 25-pattern loop (parse_spread of
+# artemis_scaper.py) on every description of the example workbook and every tranche
+# text split out of them. tests/data/parse_spread_baseline.json maps the SHA-1 of
+# each text to the spread the original function returned for it.
+
+import os
+import json
+import hashlib
+
+import pytest
+
+from conftest import DATA
+from artemis_scraper.extraction import parse_spread, parse_tranche_details
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    with open(os.path.join(DATA, "parse_spread_baseline.json"), encoding="utf-8") as f:
+        return json.load(f)["spreads"]
+
+
+def digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def test_descriptions_match_baseline(example_descriptions, baseline):
+    mismatches = [
+        (description[:80], baseline[digest(description)], parse_spread(description))
+        for description in example_descriptions
+        if parse_spread(description) != baseline[digest(description)]
+    ]
+    assert len(example_descriptions) > 700
+    assert mismatches == []
+
+
+def test_tranche_texts_match_baseline(example_descriptions, baseline):
+    texts = [
+        tranche.text
+        for description in example_descriptions
+        for tranche in parse_tranche_details(description)
+    ]
+    assert len(texts) > 900
+    mismatches = [
+        (text[:80], baseline.get(digest(text)), parse_spread(text))
+        for text in texts
+        if parse_spread(text) != baseline.get(digest(text))
+    ]
+    assert mismatches == []
+
+
+def test_no_spread():
+    assert parse_spread("The notes will provide a source of reinsurance.") == "NA"
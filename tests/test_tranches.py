@@ -0,0 +1,112 @@
+# Tranche segmentation: tranche_segments against the single regex it replaced, on
+# the example workbook, and parse_tranche_details on parent classes, "Class of" /
+# "Classes of" and repeated mentions
+
+import re
+
+import pytest
+
+from artemis_scraper.extraction import parse_tranche_details, tranche_segments
+
+# The pattern parse_tranche_details used before the anchors were scanned once
+ORIGINAL_PATTERN = re.compile(
+    r"Class\s+(?!of\b|es of\b)([A-Z0-9a-z](?:[A-Z0-9\-]*[A-Z0-9a-z])?(?![a-z]{2}))"
+    r"((?:(?!Class\s+of|Classes\s+of).)*?)"
+    r"(?=Class\s+[A-Z0-9a-z](?:[A-Z0-9\-]*[A-Z0-9a-z])?(?![a-z]{2})|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def names(description):
+    return [tranche.name for tranche in parse_tranche_details(description)]
+
+
+def test_segments_match_original_pattern(example_descriptions):
+    mismatches = [
+        description[:80]
+        for description in example_descriptions
+        if tranche_segments(description) != ORIGINAL_PATTERN.findall(description)
+    ]
+    assert mismatches == []
+
+
+def test_parent_class_removed():
+    # "A" is dropped once "A-1" is there; this used to raise on list.discard
+    description = (
+        "The Class A notes are split in two. "
+        "Class A-1 notes of $100 million have a spread of 5%. "
+        "Class A-2 notes of $50 million have a spread of 7.5%."
+    )
+    tranches = parse_tranche_details(description)
+    assert [tranche.name for tranche in tranches] == ["A-2", "A-1"]
+    assert [tranche.spread for tranche in tranches] == [7.5, 5.0]
+
+
+def test_every_parent_prefix_removed():
+    description = "Class A notes, Class A-1 notes and Class A-1-B notes. Class B notes."
+    assert names(description) == ["B", "A-1-B"]
+
+
+def test_parent_kept_without_subclasses():
+    description = "Class A notes and Class AB notes and Class B-1 notes."
+    assert names(description) == ["B-1", "AB", "A"]
+
+
+def test_class_of_is_not_a_name():
+    description = "Class A notes priced at 4%. The class of 2024 was large."
+    assert names(description) == ["A"]
+
+
+def test_classes_of_ends_a_mention():
+    # A mention whose text runs into "Classes of" is dropped
+    description = "Class A and Classes of notes. Class B notes pay a spread of 6%."
+    tranches = parse_tranche_details(description)
+    assert [tranche.name for tranche in tranches] == ["B"]
+    assert tranches[0].spread == 6.0
+
+
+def test_repeated_mentions_are_appended():
+    description = (
+        "Class A notes of $100 million. Class B notes of $50 million. "
+        "Class A notes priced with a spread of 3.25%. "
+        "Class B notes priced with a spread of 8%."
+    )
+    tranches = parse_tranche_details(description)
+    assert [tranche.name for tranche in tranches] == ["B", "A"]
+    assert tranches[1].text == (
+        "notes of $100 million. notes priced with a spread of 3.25%."
+    )
+    assert [tranche.spread for tranche in tranches] == [8.0, 3.25]
+
+
+@pytest.mark.parametrize(
+    "link, expected",
+    [
+        # Many repeated mentions of the same classes
+        ("vitality-re-iv-ltd-series-2013-1", ["C", "A", "B"]),
+        # Numbered classes with lettered sub-classes
+        ("tradewynd-re-ltd-series-2013-2", ["1-A", "1-B", "3-A", "3-B"]),
+        ("tradewynd-re-ltd-series-2014-1", ["1-B", "3-A", "3-B"]),
+    ],
+)
+def test_example_multi_tranche_deals(example_rows, link, expected):
+    # The tranche rows the workbook has for the deal, in sheet order (the reverse
+    # of parse order)
+    rows = [
+        row for row in example_rows if (row["Link"] or "").rstrip("/").endswith(link)
+    ]
+    assert [row["Deal"].split(" Class ")[-1] for row in rows] == expected
+    tranches = parse_tranche_details(rows[0]["Description"])
+    assert [tranche.name for tranche in reversed(tranches)] == expected
+
+
+def test_example_spreads_by_tranche(example_rows):
+    rows = [
+        row
+        for row in example_rows
+        if (row["Link"] or "").endswith("tradewynd-re-ltd-series-2014-1/")
+    ]
+    tranches = parse_tranche_details(rows[0]["Description"])
+    assert [tranche.spread for tranche in reversed(tranches)] == [
+        row["Spread"] for row in rows
+    ]